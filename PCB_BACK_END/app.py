@@ -5,9 +5,15 @@ from flask_socketio import SocketIO
 from flask_cors import CORS
 
 from routes.upload_routes import upload_bp
-from routes.detect_routes import detect_bp
+from routes.detect_routes import detect_bp, start_inspect_session
 from routes.debug_routes import debug_bp
+from routes.report_routes import report_bp
 from model.load_models import load_models
+from model.runtime import apply_runtime_tuning
+from utils import admission, metrics, profiling
+from utils.assets import init_assets
+from utils.report_store import ReportStore
+from utils.result_cache import ResultCache, SessionImageCache, cache_budgets
 import traceback
 
 LOG_FORMAT = "[%(asctime)s] %(levelname)s in %(module)s: %(message)s"
@@ -26,6 +32,14 @@ def create_app() -> Flask:
 
     configure_app(app)
     setup_logging(app)
+    metrics.set_enabled(app.config["METRICS_ENABLED"])
+    result_bytes, image_bytes = cache_budgets(app.config)
+    app.extensions["result_cache"] = ResultCache(result_bytes, app.config["RESULT_CACHE_TTL"])
+    app.extensions["session_images"] = SessionImageCache(image_bytes, app.config["SESSION_IMAGE_CACHE_TTL"])
+    admission.configure(app.config, on_memory_pressure=lambda: shed_caches(app))
+    profiling.configure(app.config)
+    init_assets(app)
+    app.extensions["report_store"] = ReportStore(app.config["REPORTS_DIR"])
     register_error_handlers(app)
     
     # Enable CORS for all routes
@@ -41,9 +55,16 @@ def create_app() -> Flask:
     app.register_blueprint(upload_bp)
     app.register_blueprint(detect_bp)
     app.register_blueprint(debug_bp)
+    app.register_blueprint(report_bp)
 
     register_frontend_routes(app)
     
+    # Apply autotuned torch/OpenCV thread limits and CPU pinning before the models spin up thread pools
+    try:
+        apply_runtime_tuning()
+    except Exception as e:
+        app.logger.warning(f"⚠️  Could not apply runtime tuning: {e}")
+
     # Load ML models at startup for better performance
     app.logger.info("🔄 Loading ML models at startup...")
     try:
@@ -61,6 +82,36 @@ def configure_app(app: Flask) -> None:
     app.config["UPLOAD_FOLDER"] = None
     app.config.setdefault("MAX_CONTENT_LENGTH", 32 * 1024 * 1024)
     app.config.setdefault("JSON_SORT_KEYS", False)
+    # Per-stage latency histograms served at /debug/metrics (PCB_METRICS=0 turns them off)
+    app.config.setdefault("METRICS_ENABLED", os.environ.get("PCB_METRICS", "1") != "0")
+    # Admission control for the detection routes (429 + Retry-After when overloaded).
+    # Voltage endpoints are never rejected; inference runs off the eventlet hub so they stay responsive.
+    app.config.setdefault("ADMISSION_MAX_CONCURRENT", int(os.environ.get("PCB_MAX_CONCURRENT", "1")))
+    app.config.setdefault("ADMISSION_MAX_QUEUE", int(os.environ.get("PCB_MAX_QUEUE", "4")))
+    app.config.setdefault("ADMISSION_QUEUE_TIMEOUT", float(os.environ.get("PCB_QUEUE_TIMEOUT", "30")))
+    app.config.setdefault("ADMISSION_MAX_RSS_MB", float(os.environ.get("PCB_MAX_RSS_MB", "0")))  # 0 = no ceiling
+    # cProfile captures of detection requests, listed at /debug/profiles. Off by default;
+    # when on, PCB_PROFILE_RATE of requests (and any sent with "X-PCB-Profile: 1") are captured.
+    app.config.setdefault("PROFILING_ENABLED", os.environ.get("PCB_PROFILING", "0") == "1")
+    app.config.setdefault("PROFILING_SAMPLE_RATE", float(os.environ.get("PCB_PROFILE_RATE", "0")))
+    app.config.setdefault("PROFILING_MAX_CAPTURES", int(os.environ.get("PCB_PROFILE_CAPTURES", "20")))
+    # Diagnosis report store: SQLite (WAL) plus content-addressed full/thumbnail images
+    app.config.setdefault("REPORTS_DIR", os.environ.get("PCB_REPORTS_DIR", os.path.join(app.root_path, "data", "reports")))
+    # Raw detection results kept per worker for /detect/rethreshold (LRU by bytes, idle TTL in seconds)
+    app.config.setdefault("RESULT_CACHE_MAX_MB", float(os.environ.get("PCB_RESULT_CACHE_MB", "128")))
+    app.config.setdefault("RESULT_CACHE_TTL", float(os.environ.get("PCB_RESULT_CACHE_TTL", "600")))
+    # Decoded full-resolution upload per session for /detect/roi (a 12 MP photo is ~36 MB decoded)
+    app.config.setdefault("SESSION_IMAGE_CACHE_MAX_MB", float(os.environ.get("PCB_SESSION_IMAGE_CACHE_MB", "256")))
+    app.config.setdefault("SESSION_IMAGE_CACHE_TTL", float(os.environ.get("PCB_SESSION_IMAGE_CACHE_TTL", "900")))
+    # With PCB_MAX_RSS_MB set, both cache budgets are scaled to fit this share of the ceiling
+    app.config.setdefault("CACHE_RSS_SHARE", float(os.environ.get("PCB_CACHE_RSS_SHARE", "0.25")))
+
+
+def shed_caches(app: Flask) -> None:
+    """Admission's over-memory hook: drop the cached results and session images."""
+    freed = app.extensions["result_cache"].clear() + app.extensions["session_images"].clear()
+    if freed:
+        app.logger.warning(f"⚠️  Over the RSS ceiling; shed {freed / 1024 / 1024:.1f} MB of cached images")
 
 
 def setup_logging(app: Flask) -> None:
@@ -101,10 +152,12 @@ def register_frontend_routes(app: Flask):
 
     @app.route("/missing", methods=['GET', 'POST'])
     def missing_page():
+        start_inspect_session()
         return render_template("third_page.html", page_type="missing")
 
     @app.route("/burnt", methods=['GET', 'POST'])
     def burnt_page():
+        start_inspect_session()
         return render_template("third_page.html", page_type="burnt")
 
     @app.route("/voltage", methods=['GET', 'POST'])
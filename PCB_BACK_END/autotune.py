@@ -0,0 +1,208 @@
+"""
+CPU thread / worker autotuner for inference.
+
+Benchmarks the loaded YOLO models across combinations of worker processes
+and torch intra-op threads per worker, never using more threads in total
+than there are CPUs. Each worker is a separate process that applies the
+candidate thread limits (and optional CPU pinning), loads the models and
+runs predict on a synthetic board (capped at 1500px like the detection
+path) for a fixed time at each inference size (``imgsz``): 416 is the
+cascade's coarse pass, 640 the default predict. Configurations are scored
+by aggregate images/sec (geometric mean over the sizes). The best one for
+each worker count, and the best worker count overall, are written to
+model/runtime_tuning.json. At startup model/runtime.py applies the entry
+that matches the number of workers gunicorn actually runs.
+
+Usage (from PCB_BACK_END/):
+    python autotune.py                         # full sweep, writes model/runtime_tuning.json
+    python autotune.py --imgsz 640 --duration 5 --max-workers 4 --dry-run
+"""
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from model.config import RUNTIME_TUNING
+
+# Model loading plus one warm-up predict must finish within this, or the trial fails.
+BARRIER_TIMEOUT = 600.0
+BOARD_SIZE = (1500, 1125)
+
+
+def _powers_of_two(limit: int) -> List[int]:
+    values, n = [], 1
+    while n <= limit:
+        values.append(n)
+        n *= 2
+    if limit not in values:
+        values.append(limit)
+    return values
+
+
+def candidate_configs(cpus: int, max_workers: int, try_pinning: bool) -> List[Tuple[int, int, bool]]:
+    """(workers, threads_per_worker, pin) combinations with workers * threads <= cpus."""
+    configs = []
+    for workers in _powers_of_two(min(cpus, max_workers)):
+        for threads in _powers_of_two(cpus // workers):
+            configs.append((workers, threads, False))
+            if try_pinning and workers > 1:
+                configs.append((workers, threads, True))
+    return configs
+
+
+def cpu_sets_for(workers: int, threads: int, available: Sequence[int]) -> List[List[int]]:
+    """Disjoint, contiguous CPU slices, one per worker."""
+    return [list(available[i * threads:(i + 1) * threads]) for i in range(workers)]
+
+
+def _worker(model_name: str, threads: int, cpus: Optional[List[int]], sizes: List[int], duration: float,
+            barrier, results) -> None:
+    try:
+        from benchmarks.bench_detection import make_synthetic_board
+        from model.runtime import apply_thread_limits
+
+        apply_thread_limits(torch_threads=threads, interop_threads=1, opencv_threads=1, cpus=cpus)
+
+        from model import load_models as models_registry
+        from model.config import INFERENCE_DEVICE, PREDICT_IOU, RAW_FLOOR_CONFIDENCE
+
+        models_registry.load_models()
+        model = getattr(models_registry, f"{model_name}_model")
+        image = make_synthetic_board(*BOARD_SIZE)
+
+        def predict(size: int) -> None:
+            model.predict(source=image, imgsz=size, conf=RAW_FLOOR_CONFIDENCE, iou=PREDICT_IOU,
+                          verbose=False, device=INFERENCE_DEVICE)
+
+        counts = {}
+        for size in sizes:
+            predict(size)  # warm up allocator / graph for this shape
+            barrier.wait(timeout=BARRIER_TIMEOUT)
+            done, deadline = 0, time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                predict(size)
+                done += 1
+            counts[size] = done
+        results.put(counts)
+    except threading.BrokenBarrierError:
+        results.put({"error": "a sibling worker failed or timed out"})
+    except Exception as exc:  # pylint: disable=broad-except
+        barrier.abort()  # release siblings waiting on the barrier
+        results.put({"error": f"{type(exc).__name__}: {exc}"})
+
+
+def measure(model_name: str, workers: int, threads: int, pin: bool, sizes: List[int], duration: float,
+            available_cpus: Sequence[int]) -> Dict[int, float]:
+    """Aggregate images/sec per imgsz for one configuration; RuntimeError if any worker fails."""
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    cpu_sets = cpu_sets_for(workers, threads, available_cpus) if pin else [None] * workers
+    procs = [ctx.Process(target=_worker, args=(model_name, threads, cpu_sets[i], sizes, duration, barrier, results))
+             for i in range(workers)]
+    for proc in procs:
+        proc.start()
+    totals = {size: 0 for size in sizes}
+    try:
+        for _ in procs:
+            try:
+                counts = results.get(timeout=BARRIER_TIMEOUT + duration * len(sizes) * 2)
+            except queue.Empty:
+                raise RuntimeError("workers did not report in time") from None
+            if "error" in counts:
+                raise RuntimeError(counts["error"])
+            for size, done in counts.items():
+                totals[size] += done
+    finally:
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join()
+    return {size: totals[size] / duration for size in sizes}
+
+
+def _geomean(values: Sequence[float]) -> float:
+    if not values or min(values) <= 0:
+        return 0.0
+    return math.exp(sum(math.log(v) for v in values) / len(values))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=("missing", "burnt"), default="missing")
+    parser.add_argument("--imgsz", default="416,640", help="Comma-separated inference sizes passed to predict.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds measured per imgsz.")
+    parser.add_argument("--cpus", type=int, default=len(available), help="CPUs the deployment may use.")
+    parser.add_argument("--max-workers", type=int, default=len(available))
+    parser.add_argument("--no-pinning", action="store_true", help="Do not try pinned variants.")
+    parser.add_argument("--output", default=str(RUNTIME_TUNING))
+    parser.add_argument("--dry-run", action="store_true", help="Print the best config without writing it.")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.imgsz.split(",") if s.strip()]
+    cpus = max(1, min(args.cpus, len(available)))
+    configs = candidate_configs(cpus, args.max_workers, not args.no_pinning)
+    print(f"Autotuning '{args.model}' on {cpus} CPUs: {len(configs)} configs x imgsz {sizes}, {args.duration:g}s each")
+
+    trials = []
+    for workers, threads, pin in configs:
+        try:
+            ips = measure(args.model, workers, threads, pin, sizes, args.duration, available[:cpus])
+        except RuntimeError as exc:
+            print(f"  workers={workers:<2} threads={threads:<2} pin={'y' if pin else 'n'}  ❌ failed: {exc}")
+            trials.append({"workers": workers, "torch_threads": threads, "pin_cpus": pin,
+                           "error": str(exc), "score": 0.0})
+            continue
+        score = _geomean(list(ips.values()))
+        trials.append({"workers": workers, "torch_threads": threads, "pin_cpus": pin,
+                       "images_per_sec": {str(k): round(v, 3) for k, v in ips.items()}, "score": round(score, 3)})
+        per_size = "  ".join(f"{size}px={v:6.2f}" for size, v in ips.items())
+        print(f"  workers={workers:<2} threads={threads:<2} pin={'y' if pin else 'n'}  {per_size}  score={score:.2f} img/s")
+
+    best = max(trials, key=lambda t: t["score"])
+    if best["score"] <= 0:
+        print("❌ Every configuration failed; nothing written.")
+        return 1
+    # Best config per worker count: startup applies the one matching how many workers
+    # gunicorn actually runs (1 unless PCB_USE_TUNED_WORKERS / PCB_WORKERS say otherwise).
+    by_workers = {}
+    for trial in trials:
+        current = by_workers.get(str(trial["workers"]))
+        if trial["score"] > 0 and (current is None or trial["score"] > current["score"]):
+            by_workers[str(trial["workers"])] = {
+                "torch_threads": trial["torch_threads"],
+                "pin_cpus": trial["pin_cpus"],
+                "cpu_sets": cpu_sets_for(trial["workers"], trial["torch_threads"], available[:cpus]),
+                "score": trial["score"],
+            }
+    tuning = {
+        "workers": best["workers"],
+        "interop_threads": 1,
+        "opencv_threads": 1,
+        "by_workers": by_workers,
+        "model": args.model,
+        "imgsz": sizes,
+        "cpus": cpus,
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "trials": trials,
+    }
+    print(f"✅ Best: {best['workers']} worker(s) x {best['torch_threads']} thread(s), "
+          f"pinning {'on' if best['pin_cpus'] else 'off'} -> {best['score']} img/s")
+    if args.dry_run:
+        return 0
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(tuning, handle, indent=2)
+    print(f"Written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
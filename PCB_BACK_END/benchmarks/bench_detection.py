@@ -0,0 +1,390 @@
+"""
+Offline benchmark for the detection pipeline.
+
+Runs the missing/burnt detectors over a corpus of synthetic boards and the
+sample board photo shipped in static/, either through the Flask test client
+("client" mode, exercises decode -> predict -> annotate -> JSON exactly like
+/detect/*) or by calling the detector functions directly ("direct" mode).
+
+Reports cold-start time, throughput, peak memory and p50/p95/p99 latency per
+pipeline stage (the same stages exported at /debug/metrics), writes them to a
+JSON file and exits non-zero when a run regresses past the thresholds in
+benchmarks/thresholds.json compared to a stored baseline.
+
+With --recall it also runs every corpus image through both the cascade and
+the plain predict path and fails when the cascade finds fewer than
+cascade_recall_min of the plain path's detections (at CONFIDENCE_THRESHOLD).
+
+Usage (from PCB_BACK_END/):
+    python -m benchmarks.bench_detection --mode client --iterations 5
+    python -m benchmarks.bench_detection --update-baseline
+    python -m benchmarks.bench_detection --recall
+"""
+import argparse
+import base64
+import json
+import platform
+import resource
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.stats import summarize  # noqa: E402
+from utils import metrics  # noqa: E402
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_THRESHOLDS = BENCH_DIR / "thresholds.json"
+DEFAULT_OUTPUT = BENCH_DIR / "results.json"
+
+SYNTHETIC_SIZES = [(640, 480), (1280, 960), (1920, 1440), (4032, 3024)]
+SAMPLE_IMAGES = [BACKEND_DIR / "static" / "images" / "pcb_points.jpeg"]
+MODELS = ("missing", "burnt")
+RECALL_MATCH_IOU = 0.5
+
+
+# -------------------------------------------------------------------------
+# Corpus
+# -------------------------------------------------------------------------
+def make_synthetic_board(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Green board with traces, pads and component-like blocks, deterministic per seed."""
+    rng = np.random.default_rng(seed)
+    board = np.zeros((height, width, 3), dtype=np.uint8)
+    board[:] = (40, 110, 30)
+    noise = rng.integers(0, 12, size=(height, width, 1), dtype=np.uint8)
+    board = cv2.add(board, np.repeat(noise, 3, axis=2))
+
+    unit = max(width, height) / 640.0
+    for _ in range(int(40 * unit)):
+        x1, y1 = int(rng.integers(0, width)), int(rng.integers(0, height))
+        x2 = int(np.clip(x1 + rng.integers(-200, 200) * unit, 0, width - 1))
+        cv2.line(board, (x1, y1), (x2, y1), (90, 170, 190), max(1, int(2 * unit)))
+    for _ in range(int(60 * unit)):
+        w = int(rng.integers(8, 60) * unit)
+        h = int(rng.integers(8, 40) * unit)
+        x, y = int(rng.integers(0, max(1, width - w))), int(rng.integers(0, max(1, height - h)))
+        color = tuple(int(c) for c in rng.choice([(20, 20, 20), (200, 200, 200), (30, 60, 150)]))
+        cv2.rectangle(board, (x, y), (x + w, y + h), color, -1)
+    for _ in range(int(80 * unit)):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        cv2.circle(board, center, max(2, int(4 * unit)), (180, 180, 190), -1)
+    return board
+
+
+def build_corpus(include_samples: bool = True) -> List[Tuple[str, np.ndarray]]:
+    corpus = [
+        (f"synthetic_{w}x{h}", make_synthetic_board(w, h, seed=i))
+        for i, (w, h) in enumerate(SYNTHETIC_SIZES)
+    ]
+    if include_samples:
+        for path in SAMPLE_IMAGES:
+            image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+            if image is not None:
+                corpus.append((f"sample_{path.stem}", image))
+    return corpus
+
+
+# -------------------------------------------------------------------------
+# Runners
+# -------------------------------------------------------------------------
+def _client_runner() -> Tuple[float, Callable[[str, np.ndarray], Callable[[], None]]]:
+    start = time.perf_counter()
+    from app import app  # creating the app loads both models
+
+    cold_start = time.perf_counter() - start
+    # create_app() applied PCB_METRICS; the bench always needs per-stage timings
+    metrics.set_enabled(True)
+    client = app.test_client()
+
+    def prepare(model: str, image: np.ndarray) -> Callable[[], None]:
+        ok, buffer = cv2.imencode(".jpg", image)
+        if not ok:
+            raise RuntimeError("Could not encode benchmark image.")
+        payload = {"image_base64": "data:image/jpeg;base64," + base64.b64encode(buffer.tobytes()).decode("ascii")}
+
+        def run() -> None:
+            response = client.post(f"/detect/{model}", json=payload)
+            if response.status_code != 200:
+                raise RuntimeError(f"/detect/{model} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+        return run
+
+    return cold_start, prepare
+
+
+def _direct_runner() -> Tuple[float, Callable[[str, np.ndarray], Callable[[], None]]]:
+    # Timed from before the torch/ultralytics imports, like the client runner's `from app import app`
+    start = time.perf_counter()
+    from model.detect_burnt import run_burnt_detection
+    from model.detect_missing import run_missing_detection
+    from model.load_models import load_models
+    from utils.annotate import annotate_image
+
+    load_models()
+    cold_start = time.perf_counter() - start
+    detectors = {"missing": run_missing_detection, "burnt": run_burnt_detection}
+
+    def prepare(model: str, image: np.ndarray) -> Callable[[], None]:
+        detector = detectors[model]
+
+        def run() -> None:
+            detections, processed = detector(image)
+            annotate_image(processed, detections)
+
+        return run
+
+    return cold_start, prepare
+
+
+def run_benchmark(mode: str, iterations: int, warmup: int, include_samples: bool) -> Dict:
+    metrics.set_enabled(True)
+    cold_start, prepare = (_client_runner if mode == "client" else _direct_runner)()
+    corpus = build_corpus(include_samples)
+    rss_before = metrics.current_rss_bytes()
+
+    stage_samples: Dict[str, List[float]] = defaultdict(list)
+
+    def on_stage(name: str, elapsed: float) -> None:
+        stage_samples[name].append(elapsed)
+
+    cases: Dict[str, Dict] = {}
+    all_totals: List[float] = []
+    for model in MODELS:
+        for image_name, image in corpus:
+            run = prepare(model, image)
+            for _ in range(warmup):
+                run()
+
+            stage_samples.clear()
+            totals: List[float] = []
+            metrics.add_stage_listener(on_stage)
+            try:
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    run()
+                    totals.append(time.perf_counter() - start)
+            finally:
+                metrics.remove_stage_listener(on_stage)
+
+            all_totals.extend(totals)
+            cases[f"{model}/{image_name}"] = {
+                "resolution": [int(image.shape[1]), int(image.shape[0])],
+                "throughput_ips": round(len(totals) / sum(totals), 3) if sum(totals) else 0.0,
+                "total": summarize(totals),
+                "stages": {name: summarize(samples) for name, samples in sorted(stage_samples.items())},
+            }
+            print(f"  {model:<8} {image_name:<24} p50={cases[f'{model}/{image_name}']['total']['p50_ms']:>9.1f} ms")
+
+    return {
+        "meta": {
+            "mode": mode,
+            "iterations": iterations,
+            "warmup": warmup,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "cold_start_s": round(cold_start, 3),
+        "throughput_ips": round(len(all_totals) / sum(all_totals), 3) if sum(all_totals) else 0.0,
+        "rss_before_run_mb": round(rss_before / 2**20, 1),
+        "peak_rss_mb": round(_peak_rss_bytes() / 2**20, 1),
+        "cases": cases,
+    }
+
+
+# -------------------------------------------------------------------------
+# Cascade recall
+# -------------------------------------------------------------------------
+def _iou(box: np.ndarray, others: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(box[0], others[:, 0])
+    y1 = np.maximum(box[1], others[:, 1])
+    x2 = np.minimum(box[2], others[:, 2])
+    y2 = np.minimum(box[3], others[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (others[:, 2] - others[:, 0]) * (others[:, 3] - others[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def match_count(reference, candidate, iou_threshold: float = RECALL_MATCH_IOU) -> int:
+    """Reference boxes matched one-to-one (greedy, highest confidence first) by a same-class candidate box."""
+    ref_xyxy, ref_conf, ref_cls = reference
+    cand_xyxy, _, cand_cls = candidate
+    used = np.zeros(len(cand_cls), dtype=bool)
+    matched = 0
+    for idx in np.argsort(-ref_conf):
+        pool = np.where(~used & (cand_cls == ref_cls[idx]))[0]
+        if len(pool) == 0:
+            continue
+        overlaps = _iou(ref_xyxy[idx], cand_xyxy[pool])
+        best = int(np.argmax(overlaps))
+        if overlaps[best] >= iou_threshold:
+            used[pool[best]] = True
+            matched += 1
+    return matched
+
+
+def measure_cascade_recall(include_samples: bool) -> Dict:
+    """
+    Share of the plain predict path's detections that the cascade also finds,
+    per model over the whole corpus. Both paths are the exact *_raw functions
+    /detect uses, with the module's CASCADE_ENABLED switched per call.
+    """
+    from model import detect_burnt, detect_missing
+    from model.boxes import select
+    from model.config import CONFIDENCE_THRESHOLD
+    from model.load_models import load_models
+
+    load_models()
+    modules = {"missing": detect_missing, "burnt": detect_burnt}
+    raw_functions = {"missing": detect_missing.run_missing_detection_raw, "burnt": detect_burnt.run_burnt_detection_raw}
+    corpus = build_corpus(include_samples)
+
+    def boxes(model: str, image: np.ndarray, cascade: bool):
+        module = modules[model]
+        previous, module.CASCADE_ENABLED = module.CASCADE_ENABLED, cascade
+        try:
+            (found, _), _ = raw_functions[model](image)
+        finally:
+            module.CASCADE_ENABLED = previous
+        return select(found, found[1] >= CONFIDENCE_THRESHOLD)
+
+    report = {}
+    for model in MODELS:
+        reference_total = matched_total = 0
+        for _, image in corpus:
+            reference = boxes(model, image, cascade=False)
+            reference_total += len(reference[1])
+            matched_total += match_count(reference, boxes(model, image, cascade=True))
+        report[model] = {
+            "reference": reference_total,
+            "matched": matched_total,
+            "recall": round(matched_total / reference_total, 4) if reference_total else None,
+        }
+        print(f"  {model:<8} cascade recall {report[model]['recall']} ({matched_total}/{reference_total})")
+    return report
+
+
+def check_recall(recall: Dict, thresholds: Dict) -> List[str]:
+    minimum = thresholds.get("cascade_recall_min")
+    if minimum is None:
+        return []
+    return [
+        f"{model} cascade recall {entry['recall']} ({entry['matched']}/{entry['reference']}) below {minimum}"
+        for model, entry in recall.items()
+        if entry["recall"] is not None and entry["recall"] < minimum
+    ]
+
+
+def _peak_rss_bytes() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return float(peak if platform.system() == "Darwin" else peak * 1024)
+
+
+# -------------------------------------------------------------------------
+# Regression check
+# -------------------------------------------------------------------------
+def _worse_by(current: float, baseline: float, higher_is_better: bool = False) -> float:
+    """Relative regression in percent (positive = worse)."""
+    if not baseline:
+        return 0.0
+    change = (current - baseline) / baseline * 100.0
+    return -change if higher_is_better else change
+
+
+def compare(results: Dict, baseline: Dict, thresholds: Dict) -> List[str]:
+    failures: List[str] = []
+
+    def check(label: str, current: float, base: float, limit: Optional[float], higher_is_better: bool = False):
+        if limit is None:
+            return
+        worse = _worse_by(current, base, higher_is_better)
+        if worse > limit:
+            failures.append(f"{label}: {base} -> {current} ({worse:+.1f}% worse, limit {limit}%)")
+
+    if baseline.get("meta", {}).get("mode") != results["meta"]["mode"]:
+        failures.append(f"baseline was recorded in mode {baseline.get('meta', {}).get('mode')!r}, not {results['meta']['mode']!r}")
+        return failures
+
+    check("cold_start_s", results["cold_start_s"], baseline.get("cold_start_s", 0), thresholds.get("cold_start_pct"))
+    check("peak_rss_mb", results["peak_rss_mb"], baseline.get("peak_rss_mb", 0), thresholds.get("peak_memory_pct"))
+    check("throughput_ips", results["throughput_ips"], baseline.get("throughput_ips", 0),
+          thresholds.get("throughput_pct"), higher_is_better=True)
+
+    for case, current in results["cases"].items():
+        base = baseline.get("cases", {}).get(case)
+        if base is None:
+            continue
+        for pct in ("p50_ms", "p95_ms", "p99_ms"):
+            check(f"{case} total {pct}", current["total"][pct], base["total"][pct], thresholds.get(f"latency_{pct[:3]}_pct"))
+        for stage, summary in current["stages"].items():
+            base_stage = base.get("stages", {}).get(stage)
+            if base_stage is None or base_stage["p50_ms"] < thresholds.get("stage_min_ms", 0):
+                continue
+            check(f"{case} {stage} p95_ms", summary["p95_ms"], base_stage["p95_ms"], thresholds.get("stage_p95_pct"))
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("client", "direct"), default="client")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--no-samples", action="store_true", help="Only use the synthetic corpus.")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--thresholds", type=Path, default=DEFAULT_THRESHOLDS)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--recall", action="store_true", help="Also compare cascade recall against plain predict.")
+    args = parser.parse_args(argv)
+
+    print(f"Benchmarking detection pipeline ({args.mode} mode, {args.iterations} iterations)...")
+    results = run_benchmark(args.mode, args.iterations, args.warmup, not args.no_samples)
+    print(f"cold start {results['cold_start_s']} s, throughput {results['throughput_ips']} img/s, "
+          f"peak RSS {results['peak_rss_mb']} MB")
+    thresholds = json.loads(args.thresholds.read_text()) if args.thresholds.exists() else {}
+    recall_failures: List[str] = []
+    if args.recall:
+        print("Comparing cascade recall against plain predict...")
+        results["cascade_recall"] = measure_cascade_recall(not args.no_samples)
+        recall_failures = check_recall(results["cascade_recall"], thresholds)
+
+    args.output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {args.output}")
+
+    if recall_failures:
+        print("❌ Cascade recall below threshold:")
+        for failure in recall_failures:
+            print(f"   - {failure}")
+        return 1
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print("No baseline found; run with --update-baseline to record one.")
+        return 0
+
+    failures = compare(results, json.loads(args.baseline.read_text()), thresholds)
+    if failures:
+        print("❌ Performance regression against baseline:")
+        for failure in failures:
+            print(f"   - {failure}")
+        return 1
+    print("✅ No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+"""
+Load generator for the voltage bench and dashboard fan-out.
+
+Simulates N ESP32 rigs speaking the protocol of esp32_firmware.ino: points
+are sent one by one to /detect/esp_voltage; on "PAUSE" the rig polls
+/detect/check_resume until "RESUME" and re-measures the same point. After
+the last point the firmware goes idle until the technician presses the start
+switch; each new sweep is modelled as the technician opening the voltage
+page (fifth_page.html POSTs /detect/reset_sequence on load) and the rig
+restarting at A1. The firmware itself never calls /detect/check_reset.
+M Socket.IO viewers connect to "/" like fifth_page.html and time each
+voltage_update from the moment the reading was POSTed. A technician thread
+clicks "Recheck" (/detect/resume_loop) whenever the bench is paused.
+
+Concurrency is ramped through the --devices stages; each stage reports
+ingest latency percentiles, end-to-end emit latency, error rates and,
+with --image-workers, the latency of concurrent /detect/missing traffic.
+
+Usage (from PCB_BACK_END/):
+    python -m benchmarks.load_esp32 --start-server --devices 1,5,10,25 --viewers 3
+    python -m benchmarks.load_esp32 --url http://localhost:5000 --image-workers 2
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.stats import summarize  # noqa: E402
+
+# Same order as POINTS[] in esp32_firmware.ino; expected values mirror EXPECTED_VOLTAGES.
+POINTS = (
+    ["A%d" % i for i in range(1, 10)] + ["B%d" % i for i in range(1, 10)]
+    + ["C1", "C2", "D1", "D2", "D3", "E1", "E2", "F1", "F2", "F3", "F4", "F5"]
+    + ["G%d" % i for i in range(1, 7)]
+    + ["H1", "H2", "I1", "I2", "J1", "J2", "K1", "K2", "L1", "L2", "L3", "M1", "M2", "M3",
+       "N1", "N2", "N3", "O1", "O2", "P1", "P2", "Q1", "Q2", "R1", "R2", "S1", "S2", "T1", "T2",
+       "U1", "U2", "U3", "V1", "V2", "W1", "W2", "X1", "X2", "Y1", "Y2", "Z1", "Z2", "RF"]
+)
+HIGH_PREFIXES = ("B", "D", "G", "L", "M", "N", "R", "U")
+
+
+def expected_voltage(point: str) -> float:
+    return 3.3 if point[0] in HIGH_PREFIXES and point != "RF" else 0.0
+
+
+class Recorder:
+    """Thread-safe sample store for one ramp stage."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.counts: Dict[str, int] = defaultdict(int)
+        # (point, value rounded like the server emit) -> perf_counter() at POST time
+        self.sent_at: Dict[Tuple[str, float], float] = {}
+
+    def add(self, key: str, value: float) -> None:
+        with self._lock:
+            self.samples[key].append(value)
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counts[key] += amount
+
+    def mark_sent(self, point: str, value: float) -> None:
+        with self._lock:
+            self.sent_at[(point, round(value, 3))] = time.perf_counter()
+
+    def emit_latency(self, point: str, value: float) -> Optional[float]:
+        with self._lock:
+            sent = self.sent_at.get((point, round(float(value), 3)))
+        return None if sent is None else time.perf_counter() - sent
+
+
+# -------------------------------------------------------------------------
+# Simulated actors
+# -------------------------------------------------------------------------
+def run_device(base_url: str, device_id: int, rec: Recorder, stop: threading.Event, args) -> None:
+    session = requests.Session()
+    rng = random.Random(device_id)
+    sweep = 0
+    while not stop.is_set():
+        # Technician opens the voltage page, then presses the switch: a fresh sweep from A1.
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}/detect/reset_sequence", timeout=args.timeout)
+            rec.add("reset", time.perf_counter() - start)
+            if response.status_code != 200:
+                rec.count("reset_errors")
+        except requests.RequestException:
+            rec.count("reset_errors")
+        index = 0
+        retrying = False
+        while index < len(POINTS) and not stop.is_set():
+            point = POINTS[index]
+            # Unique 3-decimal offset (< 0.25 V tolerance) so viewers can match the emit to this POST.
+            offset = ((sweep * len(POINTS) + index) * args.max_devices + device_id) % 200 * 0.001
+            value = expected_voltage(point) + offset
+            if not retrying and rng.random() < args.fault_rate:
+                value = 1.5 + offset  # outside tolerance for both 0 V and 3.3 V points
+            rec.mark_sent(point, value)
+
+            start = time.perf_counter()
+            try:
+                response = session.post(f"{base_url}/detect/esp_voltage",
+                                        json={"point": point, "value": value}, timeout=args.timeout)
+                rec.add("ingest", time.perf_counter() - start)
+                rec.count("ingest_total")
+                if response.status_code != 200:
+                    rec.count("ingest_errors")
+                    command = "CONTINUE"
+                else:
+                    command = response.json().get("command", "CONTINUE")
+            except requests.RequestException:
+                rec.count("ingest_total")
+                rec.count("ingest_errors")
+                command = "CONTINUE"
+
+            if command == "PAUSE":
+                rec.count("pauses")
+                _wait_for_resume(session, base_url, rec, stop, args)
+                retrying = True  # re-measure the SAME point, like the firmware
+            else:
+                retrying = False
+                index += 1
+                time.sleep(args.point_interval)
+
+        if stop.is_set():
+            break
+        sweep += 1
+        time.sleep(args.sweep_gap)
+
+
+def _wait_for_resume(session: requests.Session, base_url: str, rec: Recorder, stop: threading.Event, args) -> None:
+    paused_at = time.perf_counter()
+    while not stop.is_set():
+        try:
+            response = session.get(f"{base_url}/detect/check_resume", timeout=args.timeout)
+            rec.count("resume_polls")
+            if response.status_code == 200 and response.json().get("command") == "RESUME":
+                break
+        except requests.RequestException:
+            rec.count("resume_poll_errors")
+        time.sleep(args.poll_interval)
+    rec.add("paused", time.perf_counter() - paused_at)
+
+
+def run_technician(base_url: str, stop: threading.Event, args) -> None:
+    """Clicks 'Recheck' on the voltage page whenever the bench reports a pause."""
+    session = requests.Session()
+    while not stop.is_set():
+        time.sleep(args.resume_delay)
+        try:
+            response = session.get(f"{base_url}/detect/check_resume", timeout=args.timeout)
+            if response.status_code == 200 and response.json().get("command") == "WAIT":
+                session.post(f"{base_url}/detect/resume_loop", timeout=args.timeout)
+        except requests.RequestException:
+            pass
+
+
+def run_image_worker(base_url: str, payload: Dict, rec: Recorder, stop: threading.Event, args) -> None:
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}/detect/missing", json=payload, timeout=args.image_timeout)
+            rec.add("detect", time.perf_counter() - start)
+            rec.count("detect_total")
+            if response.status_code != 200:
+                rec.count("detect_errors")
+        except requests.RequestException:
+            rec.count("detect_total")
+            rec.count("detect_errors")
+
+
+def connect_viewers(base_url: str, count: int, holder: Dict[str, Recorder]) -> List:
+    if count <= 0:
+        return []
+    try:
+        import socketio
+    except ImportError:
+        raise SystemExit("python-socketio client is required for --viewers (pip install 'python-socketio[client]').")
+
+    clients = []
+    for _ in range(count):
+        client = socketio.Client(reconnection=False)
+
+        @client.on("voltage_update")
+        def on_update(data):  # noqa: ANN001 - socket.io callback
+            rec = holder["current"]
+            rec.count("emits_received")
+            latency = rec.emit_latency(data.get("point"), data.get("value", 0.0))
+            if latency is not None:
+                rec.add("emit", latency)
+
+        client.connect(base_url, transports=["websocket", "polling"], wait_timeout=10)
+        clients.append(client)
+    return clients
+
+
+# -------------------------------------------------------------------------
+# Driver
+# -------------------------------------------------------------------------
+def _synthetic_payload() -> Dict:
+    import cv2
+
+    from benchmarks.bench_detection import make_synthetic_board
+
+    ok, buffer = cv2.imencode(".jpg", make_synthetic_board(1280, 960))
+    if not ok:
+        raise RuntimeError("Could not encode synthetic board image.")
+    return {"image_base64": "data:image/jpeg;base64," + base64.b64encode(buffer.tobytes()).decode("ascii")}
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    process = subprocess.Popen(
+        ["gunicorn", "--config", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}", "app:app"],
+        cwd=str(BACKEND_DIR), env=env,
+    )
+    deadline = time.time() + 300
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode} during startup.")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/debug/health", timeout=2)
+            return process
+        except requests.RequestException:
+            time.sleep(1)
+    process.terminate()
+    raise SystemExit("Server did not become reachable within 300 s.")
+
+
+def run_stage(base_url: str, devices: int, holder: Dict[str, Recorder], payload: Optional[Dict], args) -> Dict:
+    rec = Recorder()
+    holder["current"] = rec
+    stop = threading.Event()
+    threads = [threading.Thread(target=run_device, args=(base_url, i, rec, stop, args), daemon=True)
+               for i in range(devices)]
+    threads.append(threading.Thread(target=run_technician, args=(base_url, stop, args), daemon=True))
+    if payload is not None:
+        threads += [threading.Thread(target=run_image_worker, args=(base_url, payload, rec, stop, args), daemon=True)
+                    for _ in range(args.image_workers)]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.stage_duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=args.timeout + args.image_timeout)
+    # Let in-flight emits reach the viewers before the next stage swaps recorders.
+    time.sleep(min(1.0, args.stage_duration))
+    elapsed = time.perf_counter() - started
+
+    ingest_total = rec.counts["ingest_total"]
+    result = {
+        "devices": devices,
+        "viewers": args.viewers,
+        "image_workers": args.image_workers if payload is not None else 0,
+        "duration_s": round(elapsed, 2),
+        "ingest_rps": round(ingest_total / elapsed, 2) if elapsed else 0.0,
+        "ingest": summarize(rec.samples["ingest"]),
+        "ingest_error_rate": round(rec.counts["ingest_errors"] / ingest_total, 4) if ingest_total else 0.0,
+        "pauses": rec.counts["pauses"],
+        "resets": len(rec.samples["reset"]),
+        "reset": summarize(rec.samples["reset"]),
+        "reset_errors": rec.counts["reset_errors"],
+        "paused": summarize(rec.samples["paused"]),
+        "emit": summarize(rec.samples["emit"]),
+        "emits_received": rec.counts["emits_received"],
+        "emits_expected": (ingest_total - rec.counts["ingest_errors"]) * args.viewers,
+    }
+    if payload is not None:
+        detect_total = rec.counts["detect_total"]
+        result["detect"] = summarize(rec.samples["detect"])
+        result["detect_error_rate"] = round(rec.counts["detect_errors"] / detect_total, 4) if detect_total else 0.0
+    return result
+
+
+def _print_stage(result: Dict) -> None:
+    line = (f"devices={result['devices']:<4} ingest {result['ingest_rps']:>7.1f} req/s "
+            f"p50={result['ingest']['p50_ms']:>7.1f} p95={result['ingest']['p95_ms']:>7.1f} "
+            f"p99={result['ingest']['p99_ms']:>7.1f} ms err={result['ingest_error_rate']:.2%}")
+    if result["viewers"]:
+        line += (f" | emit p50={result['emit']['p50_ms']:>7.1f} p95={result['emit']['p95_ms']:>7.1f} ms "
+                 f"recv={result['emits_received']}/{result['emits_expected']}")
+    if "detect" in result:
+        line += (f" | detect p50={result['detect']['p50_ms']:>8.1f} p95={result['detect']['p95_ms']:>8.1f} ms "
+                 f"err={result['detect_error_rate']:.2%}")
+    print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--start-server", action="store_true", help="Start gunicorn locally on --port.")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--devices", default="1,5,10,25", help="Comma-separated ramp of concurrent rigs.")
+    parser.add_argument("--viewers", type=int, default=2, help="Socket.IO dashboard viewers.")
+    parser.add_argument("--image-workers", type=int, default=0, help="Concurrent /detect/missing clients.")
+    parser.add_argument("--stage-duration", type=float, default=20.0, help="Seconds per ramp stage.")
+    parser.add_argument("--fault-rate", type=float, default=0.01, help="Probability a reading is out of tolerance.")
+    parser.add_argument("--point-interval", type=float, default=0.56,
+                        help="Delay between points (firmware: 20x3 ms sampling + 500 ms).")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="check_resume poll period while paused.")
+    parser.add_argument("--resume-delay", type=float, default=2.0, help="Technician reaction time to a pause.")
+    parser.add_argument("--sweep-gap", type=float, default=2.0,
+                        help="Idle time between sweeps (technician re-opening the page and pressing the switch).")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--image-timeout", type=float, default=120.0)
+    parser.add_argument("--output", type=Path, help="Write the per-stage results as JSON.")
+    args = parser.parse_args(argv)
+
+    ramp = [int(n) for n in args.devices.split(",") if n.strip()]
+    args.max_devices = max(ramp)
+
+    server = start_server(args.port) if args.start_server else None
+    base_url = f"http://127.0.0.1:{args.port}" if server else args.url.rstrip("/")
+    holder: Dict[str, Recorder] = {"current": Recorder()}
+    clients = []
+    try:
+        clients = connect_viewers(base_url, args.viewers, holder)
+        payload = _synthetic_payload() if args.image_workers > 0 else None
+        print(f"Load test against {base_url}: ramp {ramp}, {args.viewers} viewers, "
+              f"{args.image_workers} image workers, {args.stage_duration:g}s per stage")
+        results = []
+        for devices in ramp:
+            result = run_stage(base_url, devices, holder, payload, args)
+            _print_stage(result)
+            results.append(result)
+    finally:
+        for client in clients:
+            client.disconnect()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    if args.output:
+        args.output.write_text(json.dumps({"url": base_url, "stages": results}, indent=2))
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Static asset build step.
+
+Writes an optimized copy of static/ into static/dist/:
+  - animated GIF backgrounds are transcoded to animated WebP (ffmpeg, or
+    Pillow as a fallback) and used only when smaller than the original
+  - every file gets a content-hash fingerprint in its name so it can be
+    served with a long-lived immutable Cache-Control
+  - CSS/JS/SVG/JSON are precompressed to .gz (and .br when brotli is installed)
+  - static/dist/manifest.json maps the logical name used in
+    url_for('static', filename=...) to the built file
+
+utils/assets.py picks up the manifest at startup, so templates need no changes.
+
+Usage (from PCB_BACK_END/):
+    python build_assets.py            # build
+    python build_assets.py --clean    # remove static/dist
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+
+SKIP_SUFFIXES = {".backup", ".gz", ".br"}
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".svg", ".json", ".txt"}
+HASH_LENGTH = 10
+
+
+def _fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def _transcode_gif(source: Path) -> Optional[bytes]:
+    """Animated WebP bytes for a GIF, or None when no encoder is available."""
+    with tempfile.TemporaryDirectory() as tmp:
+        target = Path(tmp) / "out.webp"
+        if shutil.which("ffmpeg"):
+            result = subprocess.run(
+                ["ffmpeg", "-loglevel", "error", "-y", "-i", str(source), "-c:v", "libwebp_anim",
+                 "-lossless", "0", "-q:v", "70", "-loop", "0", "-an", str(target)],
+                check=False,
+            )
+            if result.returncode == 0 and target.exists():
+                return target.read_bytes()
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        with Image.open(source) as image:
+            image.save(target, format="WEBP", save_all=True, quality=70, method=4, loop=0)
+        return target.read_bytes()
+
+
+def _precompress(path: Path) -> None:
+    data = path.read_bytes()
+    with gzip.open(f"{path}.gz", "wb", compresslevel=9) as handle:
+        handle.write(data)
+    try:
+        import brotli
+    except ImportError:
+        return
+    Path(f"{path}.br").write_bytes(brotli.compress(data, quality=11))
+
+
+def build(static_dir: Path = STATIC_DIR) -> Dict[str, str]:
+    dist_dir = static_dir / DIST_DIRNAME
+    if dist_dir.exists():
+        shutil.rmtree(dist_dir)
+    dist_dir.mkdir(parents=True)
+
+    manifest: Dict[str, str] = {}
+    saved = 0
+    for source in sorted(static_dir.rglob("*")):
+        if not source.is_file() or dist_dir in source.parents or source.suffix in SKIP_SUFFIXES:
+            continue
+        logical = source.relative_to(static_dir).as_posix()
+        data = source.read_bytes()
+        suffix = source.suffix
+
+        if suffix.lower() == ".gif":
+            webp = _transcode_gif(source)
+            if webp is not None and len(webp) < len(data):
+                saved += len(data) - len(webp)
+                print(f"  transcoded {logical}: {len(data) // 1024} KB -> {len(webp) // 1024} KB (webp)")
+                data, suffix = webp, ".webp"
+            elif webp is None:
+                print(f"  ⚠️  no WebP encoder (ffmpeg/Pillow) for {logical}; keeping GIF")
+
+        built_name = f"{source.stem}.{_fingerprint(data)}{suffix}"
+        built_rel = Path(DIST_DIRNAME) / Path(logical).parent / built_name
+        target = static_dir / built_rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        if suffix.lower() in COMPRESSIBLE_SUFFIXES:
+            _precompress(target)
+        manifest[logical] = built_rel.as_posix()
+
+    (dist_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    print(f"✅ Built {len(manifest)} assets into {dist_dir} (transcoding saved {saved // 1024} KB)")
+    return manifest
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clean", action="store_true", help="Remove static/dist and exit.")
+    args = parser.parse_args(argv)
+    if args.clean:
+        shutil.rmtree(STATIC_DIR / DIST_DIRNAME, ignore_errors=True)
+        return 0
+    build()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,7 @@
 # Fix Render worker timeouts and socket failures
+import json
+import os
+from pathlib import Path
 
 worker_class = "eventlet"
 workers = 1
@@ -6,6 +9,71 @@ timeout = 300
 graceful_timeout = 300
 keepalive = 5
 
+# Worker count from autotune.py is opt-in: Socket.IO needs sticky sessions
+# and a message queue before more than one worker can serve the dashboard.
+_tuning_file = Path(__file__).resolve().parent / "model" / "runtime_tuning.json"
+_tuning = json.loads(_tuning_file.read_text()) if _tuning_file.exists() else None
+if os.environ.get("PCB_WORKERS"):
+    workers = int(os.environ["PCB_WORKERS"])
+elif _tuning and os.environ.get("PCB_USE_TUNED_WORKERS") == "1":
+    workers = int(_tuning.get("workers", 1))
+
+# The bench state (SYSTEM_STATE pause/resume, reset flag, LATEST_SWEEP), the
+# result/session-image caches and Socket.IO rooms all live in one process.
+# With several workers a PAUSE recorded by one is answered RESUME by another
+# and dashboard emits reach only some viewers. Refuse unless explicitly
+# overridden for detection-only deployments (no voltage bench or dashboard).
+if workers > 1 and os.environ.get("PCB_ALLOW_MULTI_WORKER") != "1":
+    raise SystemExit(
+        f"Refusing to start {workers} workers: voltage bench state, caches and Socket.IO are per process. "
+        "Use 1 worker, or set PCB_ALLOW_MULTI_WORKER=1 for a detection-only deployment."
+    )
+
+# Lets model.runtime apply the autotune entry measured for this many workers
+os.environ["PCB_WORKER_COUNT"] = str(workers)
+
 # Disable worker auto-reload behavior that causes "Bad file descriptor"
 reload = False
 loglevel = "info"
+
+# PCB_PRELOAD=1: load and freeze the models once in the master, so forked workers
+# share the weights copy-on-write and each extra worker costs only its activations.
+preload_app = os.environ.get("PCB_PRELOAD") == "1"
+if preload_app:
+    # Patch threading before the app (and its locks/conditions) is imported in the
+    # master, otherwise workers inherit non-green primitives created pre-fork.
+    # Only threading: a green select/os in the master breaks the arbiter's signal
+    # wakeup pipe ("do not call blocking functions from the mainloop"). The
+    # eventlet worker patches everything else itself after fork.
+    import eventlet
+
+    eventlet.monkey_patch(thread=True)
+
+
+def when_ready(server):
+    if preload_app:
+        from model.load_models import prepare_for_fork
+
+        prepare_for_fork()
+
+
+def post_fork(server, worker):
+    # Lets model.runtime pick this worker's entry and CPU set from runtime_tuning.json
+    os.environ["PCB_WORKER_COUNT"] = str(server.num_workers)
+    os.environ["PCB_WORKER_INDEX"] = str((worker.age - 1) % max(1, server.num_workers))
+    if preload_app:
+        # create_app already ran in the master; apply this worker's thread limits / pinning here.
+        from model.runtime import apply_runtime_tuning
+
+        apply_runtime_tuning()
+
+
+def post_worker_init(worker):
+    from utils.memory import process_memory
+
+    memory = process_memory()
+    if memory:
+        worker.log.info(
+            "Worker %s memory: RSS %.0f MB, PSS %.0f MB, USS %.0f MB",
+            worker.pid, memory["rss_bytes"] / 2**20, memory["pss_bytes"] / 2**20, memory["uss_bytes"] / 2**20,
+        )
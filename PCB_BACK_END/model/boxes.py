@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+from ultralytics.engine.results import Results
+
+from .config import PREDICT_IOU
+
+# Raw detections as parallel arrays: xyxy (N, 4) float32, conf (N,), cls (N,) int
+BoxArrays = Tuple[np.ndarray, np.ndarray, np.ndarray]
+# Raw boxes plus the model's class-id -> label map
+RawPrediction = Tuple[BoxArrays, Mapping[int, str]]
+
+
+def empty_boxes() -> BoxArrays:
+    return np.zeros((0, 4), dtype=np.float32), np.zeros((0,), dtype=np.float32), np.zeros((0,), dtype=np.int64)
+
+
+def result_arrays(result: Results) -> BoxArrays:
+    """Copy an ultralytics Results' boxes into plain numpy arrays."""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return empty_boxes()
+    return (
+        boxes.xyxy.cpu().numpy().astype(np.float32),
+        boxes.conf.cpu().numpy().astype(np.float32),
+        boxes.cls.cpu().numpy().astype(np.int64),
+    )
+
+
+def concat(*parts: BoxArrays) -> BoxArrays:
+    parts = [p for p in parts if len(p[1])]
+    if not parts:
+        return empty_boxes()
+    return (
+        np.concatenate([p[0] for p in parts]),
+        np.concatenate([p[1] for p in parts]),
+        np.concatenate([p[2] for p in parts]),
+    )
+
+
+def select(boxes: BoxArrays, mask: np.ndarray) -> BoxArrays:
+    return boxes[0][mask], boxes[1][mask], boxes[2][mask]
+
+
+def nms(boxes: BoxArrays, iou_threshold: float = PREDICT_IOU) -> BoxArrays:
+    """Class-aware non-maximum suppression (greedy, highest confidence first)."""
+    xyxy, conf, cls = boxes
+    if len(conf) == 0:
+        return boxes
+    # Offset boxes per class so boxes of different classes never overlap.
+    offset = xyxy + (cls.astype(np.float32) * (float(xyxy.max()) + 1.0))[:, None]
+    x1, y1, x2, y2 = offset.T
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    order = conf.argsort()[::-1]
+    keep: List[int] = []
+    while order.size:
+        i = order[0]
+        keep.append(int(i))
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_threshold]
+    keep_idx = np.array(keep, dtype=np.int64)
+    return xyxy[keep_idx], conf[keep_idx], cls[keep_idx]
+
+
+def to_detections(boxes: BoxArrays, names: Mapping[int, str]) -> List[Dict]:
+    """Format raw boxes as the detection dicts returned by the API."""
+    xyxy, conf, cls = boxes
+    detections: List[Dict] = []
+    for idx in range(len(conf)):
+        x1, y1, x2, y2 = xyxy[idx].tolist()
+        label_idx = int(cls[idx])
+        detections.append(
+            {
+                "label": names.get(label_idx, str(label_idx)),
+                "label_id": label_idx,
+                "confidence": round(float(conf[idx]), 4),
+                "bbox": [int(x1), int(y1), int(x2), int(y2)],
+            }
+        )
+    return detections
+
+
+def filter_detections(
+    raw: RawPrediction,
+    confidence: float,
+    classes: Optional[Iterable] = None,
+    iou: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Apply a confidence threshold and optional class subset (ids or labels) to
+    raw boxes, re-run NMS when an IoU is given, and format for the response.
+    """
+    boxes, names = raw
+    mask = boxes[1] >= confidence
+    if classes is not None:
+        wanted = {str(c) for c in classes}
+        mask &= np.array(
+            [str(int(c)) in wanted or names.get(int(c), str(int(c))) in wanted for c in boxes[2]], dtype=bool
+        ).reshape(-1)
+    kept = select(boxes, mask)
+    if iou is not None:
+        kept = nms(kept, iou)
+    return to_detections(kept, names)
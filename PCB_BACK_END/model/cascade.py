@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from utils import metrics
+from utils.offload import run_blocking
+
+from .boxes import BoxArrays, RawPrediction, concat, empty_boxes, nms, result_arrays, select
+from .config import (
+    CASCADE_COARSE_IMGSZ,
+    CASCADE_DENSE_COUNT,
+    CASCADE_ESCALATE_MARGIN,
+    CASCADE_MAX_CROPS,
+    CASCADE_MIN_CROPS,
+    CASCADE_PRIOR_ESCALATION,
+    CASCADE_PRIOR_RUNS,
+    CASCADE_REFINE_IMGSZ,
+    CASCADE_SMALL_BOX_PX,
+    CASCADE_UNCERTAIN_BELOW,
+    CONFIDENCE_THRESHOLD,
+    DEFAULT_IMGSZ,
+    INFERENCE_DEVICE,
+    PREDICT_IOU,
+)
+
+Region = Tuple[int, int, int, int]
+# Refined boxes this close to an inner crop edge are treated as truncated.
+EDGE_MARGIN_PX = 2
+
+CASCADE_REQUESTS = metrics.Counter(
+    "pcb_cascade_requests_total",
+    "Cascade inference runs, by whether any region was escalated to native resolution.",
+    ("model", "escalated"),
+)
+CASCADE_CROPS = metrics.Counter(
+    "pcb_cascade_crops_total",
+    "Crops re-run at native resolution by the cascade.",
+    ("model",),
+)
+metrics.REGISTRY.extend([CASCADE_REQUESTS, CASCADE_CROPS])
+
+_stats: Dict[str, Dict[str, int]] = {}
+
+if CASCADE_COARSE_IMGSZ >= DEFAULT_IMGSZ:
+    print(f"⚠️  Cascade coarse size {CASCADE_COARSE_IMGSZ} is not below {DEFAULT_IMGSZ}: no pixel budget "
+          f"is left for refine crops, escalation is limited to {CASCADE_MIN_CROPS} crop(s).")
+
+
+def stats() -> Dict[str, Dict]:
+    """Escalation counts per model, for /debug/status."""
+    report = {}
+    for model_name, counts in _stats.items():
+        runs = counts["runs"]
+        report[model_name] = {
+            **counts,
+            "escalation_rate": round(counts["escalated"] / runs, 4) if runs else 0.0,
+            "crops_per_escalation": round(counts["crops"] / counts["escalated"], 2) if counts["escalated"] else 0.0,
+            "crop_budget": crop_budget(expected_escalation_rate(model_name)),
+        }
+    return report
+
+
+def expected_escalation_rate(model_name: str) -> float:
+    """Observed share of escalated runs, smoothed towards CASCADE_PRIOR_ESCALATION while runs are few."""
+    counts = _stats.get(model_name, {})
+    escalated = counts.get("escalated", 0) + CASCADE_PRIOR_ESCALATION * CASCADE_PRIOR_RUNS
+    return escalated / (counts.get("runs", 0) + CASCADE_PRIOR_RUNS)
+
+
+def crop_budget(escalation_rate: float = 1.0) -> int:
+    """
+    Most refine crops that keep the *average* request, coarse pass plus
+    ``escalation_rate`` of a refine pass, within the pixels of one DEFAULT_IMGSZ
+    predict. The refine call's own fixed cost (pre/post-processing, measured at
+    about one crop's worth on CPU) is charged as one extra crop. At rate 1.0 this
+    caps every escalated request; lower rates buy more crops per escalation.
+    Never below CASCADE_MIN_CROPS, so a large coarse size cannot switch escalation off.
+    """
+    spare = DEFAULT_IMGSZ ** 2 - CASCADE_COARSE_IMGSZ ** 2
+    affordable = int(spare / (max(escalation_rate, 1e-3) * CASCADE_REFINE_IMGSZ ** 2)) - 1
+    return max(min(CASCADE_MIN_CROPS, CASCADE_MAX_CROPS), min(CASCADE_MAX_CROPS, affordable))
+
+
+def run_cascade(model, image: np.ndarray, confidence: float, model_name: str) -> RawPrediction:
+    """
+    Coarse pass at CASCADE_COARSE_IMGSZ over the whole image, then one batched
+    pass over CASCADE_REFINE_IMGSZ-sized native-resolution crops around
+    uncertain or small detections and dense regions (at most crop_budget() at
+    the model's expected escalation rate).
+    Coarse boxes fully inside a refined crop are replaced by the crop's
+    results; everything is merged with NMS at the model's own PREDICT_IOU.
+    Returns raw boxes down to ``confidence`` (the caller applies its threshold);
+    that floor only decides what is returned, escalation looks at boxes from
+    CONFIDENCE_THRESHOLD - CASCADE_ESCALATE_MARGIN up.
+    """
+    height, width = image.shape[:2]
+    with metrics.stage("predict_coarse"):
+        coarse_results = run_blocking(
+            model.predict, serialize=model_name,
+            source=image, imgsz=CASCADE_COARSE_IMGSZ, conf=confidence,
+            verbose=False, device=INFERENCE_DEVICE,
+        )
+    if not coarse_results:
+        return empty_boxes(), {}
+    names = coarse_results[0].names or {}
+    coarse = result_arrays(coarse_results[0])
+
+    candidates = select(coarse, coarse[1] >= CONFIDENCE_THRESHOLD - CASCADE_ESCALATE_MARGIN)
+    regions = _escalation_regions(candidates, width, height, crop_budget(expected_escalation_rate(model_name)))
+    counts = _stats.setdefault(model_name, {"runs": 0, "escalated": 0, "crops": 0})
+    counts["runs"] += 1
+    CASCADE_REQUESTS.inc(model_name, "true" if regions else "false")
+    if not regions:
+        return nms(select(coarse, coarse[1] >= confidence), PREDICT_IOU), names
+
+    counts["escalated"] += 1
+    counts["crops"] += len(regions)
+    CASCADE_CROPS.inc(model_name, amount=len(regions))
+
+    with metrics.stage("predict_refine"):
+        refined_results = run_blocking(
+            model.predict, serialize=model_name,
+            source=[image[y1:y2, x1:x2] for x1, y1, x2, y2 in regions],
+            imgsz=CASCADE_REFINE_IMGSZ, conf=confidence, verbose=False, device=INFERENCE_DEVICE,
+        )
+
+    with metrics.stage("merge"):
+        refined_parts = [
+            _to_image_coords(result_arrays(result), region, width, height)
+            for region, result in zip(regions, refined_results)
+        ]
+        # Coarse boxes clear of a crop's inner edges are superseded by that crop's results;
+        # ones touching an inner edge stay, since the crop drops its truncated copy.
+        replaced = np.zeros(len(coarse[1]), dtype=bool)
+        b = coarse[0]
+        for x1, y1, x2, y2 in regions:
+            ix1, iy1, ix2, iy2 = _inner_bounds((x1, y1, x2, y2), width, height)
+            replaced |= (b[:, 0] > ix1) & (b[:, 1] > iy1) & (b[:, 2] < ix2) & (b[:, 3] < iy2)
+        kept_coarse = select(coarse, ~replaced & (coarse[1] >= confidence))
+        merged = nms(concat(kept_coarse, *refined_parts), PREDICT_IOU)
+    return merged, names
+
+
+def _escalation_regions(coarse: BoxArrays, width: int, height: int, max_crops: int) -> List[Region]:
+    xyxy, conf, _ = coarse
+    if len(conf) == 0 or max_crops <= 0:
+        return []
+    centers = np.stack([(xyxy[:, 0] + xyxy[:, 2]) / 2, (xyxy[:, 1] + xyxy[:, 3]) / 2], axis=1)
+    sides = np.minimum(xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1])
+    crop = CASCADE_REFINE_IMGSZ
+
+    # Seeds in priority order: dense cells (most boxes first), then uncertain boxes (least confident first).
+    seeds: List[Tuple[float, float]] = []
+    cols, rows = max(1, -(-width // crop)), max(1, -(-height // crop))
+    cell_idx = (np.minimum(centers[:, 1] // crop, rows - 1) * cols + np.minimum(centers[:, 0] // crop, cols - 1))
+    cell_counts = np.bincount(cell_idx.astype(np.int64), minlength=rows * cols)
+    for cell in np.argsort(-cell_counts):
+        if cell_counts[cell] < CASCADE_DENSE_COUNT:
+            break
+        row, col = divmod(int(cell), cols)
+        seeds.append(((col + 0.5) * crop, (row + 0.5) * crop))
+
+    uncertain = (conf < CASCADE_UNCERTAIN_BELOW) | (sides < CASCADE_SMALL_BOX_PX)
+    for idx in np.where(uncertain)[0][np.argsort(conf[uncertain])]:
+        seeds.append((float(centers[idx, 0]), float(centers[idx, 1])))
+
+    regions: List[Region] = []
+    margin = crop // 8
+    for cx, cy in seeds:
+        if len(regions) >= max_crops:
+            break
+        if any(x1 + margin <= cx <= x2 - margin and y1 + margin <= cy <= y2 - margin for x1, y1, x2, y2 in regions):
+            continue
+        x1 = int(min(max(0, cx - crop / 2), max(0, width - crop)))
+        y1 = int(min(max(0, cy - crop / 2), max(0, height - crop)))
+        regions.append((x1, y1, min(width, x1 + crop), min(height, y1 + crop)))
+    return regions
+
+
+def _inner_bounds(region: Region, width: int, height: int) -> Tuple[float, float, float, float]:
+    """Region shrunk by EDGE_MARGIN_PX on the sides that lie inside the image (image borders stay open)."""
+    x1, y1, x2, y2 = region
+    return (
+        x1 + EDGE_MARGIN_PX if x1 > 0 else -np.inf,
+        y1 + EDGE_MARGIN_PX if y1 > 0 else -np.inf,
+        x2 - EDGE_MARGIN_PX if x2 < width else np.inf,
+        y2 - EDGE_MARGIN_PX if y2 < height else np.inf,
+    )
+
+
+def _to_image_coords(boxes: BoxArrays, region: Region, width: int, height: int) -> BoxArrays:
+    """Shift crop boxes into full-image coordinates and drop ones cut by an inner crop edge."""
+    x1, y1 = region[0], region[1]
+    xyxy = boxes[0] + np.array([x1, y1, x1, y1], dtype=np.float32)
+    ix1, iy1, ix2, iy2 = _inner_bounds(region, width, height)
+    inside = (xyxy[:, 0] > ix1) & (xyxy[:, 1] > iy1) & (xyxy[:, 2] < ix2) & (xyxy[:, 3] < iy2)
+    return select((xyxy, boxes[1], boxes[2]), inside)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Absolute directory of model folder: PCB_BACK_END/model/
@@ -7,7 +8,48 @@ BASE_DIR = Path(__file__).resolve().parent
 MODEL_MISSING = (BASE_DIR / "missing.pt").resolve()
 MODEL_BURNT   = (BASE_DIR / "burnt.pt").resolve()
 
-CONFIDENCE_THRESHOLD = 0.5
+# Default threshold applied to detection responses (technicians can re-threshold
+# cached results via /detect/rethreshold without re-running the model)
+CONFIDENCE_THRESHOLD = 0.25
+# Models always predict down to this floor; the raw boxes are cached per result
+RAW_FLOOR_CONFIDENCE = 0.05
+# IoU used by the model's own NMS and as the default when re-running NMS on cached boxes
+PREDICT_IOU = 0.7
+
+# Inference device passed to model.predict (the deployment targets are CPU-only boxes)
+INFERENCE_DEVICE = "cpu"
+
+# Cascade inference (PCB_CASCADE=1): fast low-resolution pass over the whole board, then
+# native-resolution re-runs only on crops around uncertain detections or dense regions.
+# Crops are CASCADE_REFINE_IMGSZ pixels of the original image run at that same size
+# (1:1). The crop count is budgeted so the *average* request (coarse pass plus the
+# escalated share of refine passes) stays within the pixels of one DEFAULT_IMGSZ predict
+# (see cascade.crop_budget); a single escalated request may cost more than that.
+CASCADE_ENABLED = os.environ.get("PCB_CASCADE", "0") == "1"
+DEFAULT_IMGSZ = 640                 # ultralytics' predict size, used by the non-cascade path
+CASCADE_COARSE_IMGSZ = int(os.environ.get("PCB_CASCADE_COARSE_IMGSZ", "416"))
+CASCADE_REFINE_IMGSZ = int(os.environ.get("PCB_CASCADE_REFINE_IMGSZ", "320"))
+CASCADE_MAX_CROPS = int(os.environ.get("PCB_CASCADE_MAX_CROPS", "8"))
+CASCADE_MIN_CROPS = 1               # escalation stays on even when the pixel budget is spent
+# Escalation rate assumed before a model has traffic; the observed rate takes over
+# as runs accumulate (weighted as this many prior runs).
+CASCADE_PRIOR_ESCALATION = 0.5
+CASCADE_PRIOR_RUNS = 20
+# Only coarse boxes that could plausibly cross CONFIDENCE_THRESHOLD seed crops: the raw
+# floor boxes below the band are kept for re-thresholding but never escalated.
+CASCADE_ESCALATE_MARGIN = 0.10      # band starts this far below CONFIDENCE_THRESHOLD
+CASCADE_UNCERTAIN_BELOW = 0.50      # in-band boxes below this are re-checked
+CASCADE_DENSE_COUNT = 6             # in-band boxes per crop-sized cell that mark it as dense
+CASCADE_SMALL_BOX_PX = 24           # in-band boxes smaller than this (either side) are re-checked too
+
+# ROI re-inspection (/detect/roi): crops run at their own size, rounded up to the model stride
+ROI_MIN_SIDE = 32                   # smaller regions are rejected
+ROI_MIN_IMGSZ = 320                 # tiny crops are upsampled to at least this
+ROI_MAX_IMGSZ = 1280                # larger crops are downsampled to this
+MODEL_STRIDE = 32
+
+# Written by autotune.py; thread limits / CPU pinning applied at startup when present
+RUNTIME_TUNING = (BASE_DIR / "runtime_tuning.json").resolve()
 
 
 def ensure_model_path(path: Path) -> Path:
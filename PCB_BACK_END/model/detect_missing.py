@@ -1,66 +1,60 @@
 from __future__ import annotations
 import cv2
 
-from typing import Dict, List, Union
+from typing import Dict, List, Tuple, Union
 
 import numpy as np
-from ultralytics.engine.results import Results
+
+from utils import metrics
+from utils.offload import run_blocking
 
 from . import load_models as models_registry
+from .boxes import RawPrediction, empty_boxes, filter_detections, result_arrays
+from .cascade import run_cascade
+from .config import CASCADE_ENABLED, CONFIDENCE_THRESHOLD, INFERENCE_DEVICE, PREDICT_IOU, RAW_FLOOR_CONFIDENCE
 
 ImageInput = Union[str, np.ndarray]
 
 
-def run_missing_detection(image_input: ImageInput) -> List[Dict]:
+def run_missing_detection(image_input: ImageInput) -> Tuple[List[Dict], np.ndarray]:
+    raw, image_input = run_missing_detection_raw(image_input)
+    with metrics.stage("format"):
+        detections = filter_detections(raw, CONFIDENCE_THRESHOLD)
+    return detections, image_input   # <— return resized image also
+
+
+def run_missing_detection_raw(image_input: ImageInput) -> Tuple[RawPrediction, np.ndarray]:
+    """
+    Predict once at RAW_FLOOR_CONFIDENCE and return the unfiltered boxes, so any
+    stricter threshold can be applied later without re-running the model.
+    """
     # Resize huge images to prevent OOM
     h, w = image_input.shape[:2]
     if max(h, w) > 1500:
         scale = 1500 / max(h, w)
-        image_input = cv2.resize(image_input, (int(w*scale), int(h*scale)))
+        with metrics.stage("resize"):
+            image_input = cv2.resize(image_input, (int(w*scale), int(h*scale)))
 
     # Models are pre-loaded at startup, just validate they exist
     model = models_registry.missing_model
     if model is None:
         raise RuntimeError("Missing components model not loaded. Please restart the application.")
 
-    CONFIDENCE = 0.25  # ✅ Same fixed confidence
-
-    results = model.predict(
-        source=image_input,
-        conf=CONFIDENCE,   # ✅ CONFIDENCE FILTER APPLIED
-        verbose=False,
-        device='cpu'
-    )
+    if CASCADE_ENABLED:
+        return run_cascade(model, image_input, RAW_FLOOR_CONFIDENCE, "missing"), image_input
+
+    with metrics.stage("predict"):
+        results = run_blocking(
+            model.predict,
+            serialize="missing",
+            source=image_input,
+            conf=RAW_FLOOR_CONFIDENCE,   # floor only; the response threshold is applied afterwards
+            iou=PREDICT_IOU,
+            verbose=False,
+            device=INFERENCE_DEVICE
+        )
 
     if not results:
-        return []
-
-    detections = _format_detections(results[0])
-    return detections, image_input   # <— return resized image also
-
-
-
-
-
-
-def _format_detections(result: Results) -> List[Dict]:
-    boxes = result.boxes
-    detections: List[Dict] = []
-    names = result.names or {}
-
-    for idx in range(len(boxes)):
-        x1, y1, x2, y2 = boxes.xyxy[idx].tolist()
-        confidence = float(boxes.conf[idx].item())
-        label_idx = int(boxes.cls[idx].item())
-        label = names.get(label_idx, str(label_idx))
-
-        detections.append(
-            {
-                "label": label,
-                "label_id": label_idx,
-                "confidence": round(confidence, 4),
-                "bbox": [int(x1), int(y1), int(x2), int(y2)],
-            }
-        )
+        return (empty_boxes(), {}), image_input
 
-    return detections
+    return (result_arrays(results[0]), results[0].names or {}), image_input
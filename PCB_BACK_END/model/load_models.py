@@ -1,9 +1,14 @@
+import gc
+import hashlib
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
+
+import numpy as np
 from ultralytics import YOLO
 
 from .config import (
     CONFIDENCE_THRESHOLD,
+    INFERENCE_DEVICE,
     MODEL_BURNT,
     MODEL_MISSING,
     ensure_model_path
@@ -11,6 +16,7 @@ from .config import (
 
 missing_model: Optional[YOLO] = None
 burnt_model: Optional[YOLO] = None
+_model_versions: Optional[Dict[str, str]] = None
 
 
 def _load_model(model_path: Path) -> YOLO:
@@ -21,12 +27,12 @@ def _load_model(model_path: Path) -> YOLO:
     model.overrides["conf"] = CONFIDENCE_THRESHOLD
     # Disable fusion (saves 150–300 MB RAM)
     model.fuse = lambda *args, **kwargs: model
-    model.overrides["device"] = "cpu"
+    model.overrides["device"] = INFERENCE_DEVICE
     # ensure backend model is on cpu and in eval mode to avoid re-fusing during request handling
     try:
         # ultralytics wrapper exposes .model (nn.Module) for lower-level ops
         if hasattr(model, "model") and getattr(model, "model") is not None:
-            model.model.to("cpu")
+            model.model.to(INFERENCE_DEVICE)
             model.model.eval()
     except Exception:
         # don't fail load if the low-level attributes differ across ultralytics versions
@@ -48,3 +54,61 @@ def load_models() -> None:
         print(f"🔄 Loading burnt model from: {MODEL_BURNT}")
         burnt_model = _load_model(MODEL_BURNT)
         print("✅ Burnt model loaded successfully!")
+
+
+def model_versions() -> Dict[str, str]:
+    """'<file name>@<sha256 prefix>' per model, recorded with each diagnosis report."""
+    global _model_versions
+    if _model_versions is None:
+        versions = {}
+        for name, path in (("missing", MODEL_MISSING), ("burnt", MODEL_BURNT)):
+            if not path.exists():
+                versions[name] = "unavailable"
+                continue
+            digest = hashlib.sha256()
+            with open(path, "rb") as handle:
+                for chunk in iter(lambda: handle.read(1 << 20), b""):
+                    digest.update(chunk)
+            versions[name] = f"{path.name}@{digest.hexdigest()[:12]}"
+        _model_versions = versions
+    return _model_versions
+
+
+def prepare_for_fork(warmup: bool = True) -> None:
+    """
+    Finish every lazy allocation in the gunicorn master (preload mode) so
+    forked workers share the weight pages copy-on-write.
+
+    The first predict() builds the predictor and fuses Conv+BN into new
+    tensors. If that ran in each worker, every worker would end up with a
+    private copy of the weights, so the warm-up happens here. Parameters are
+    frozen so nothing can write to them. gc.freeze() moves the loaded objects
+    out of the collector's reach, so later collections don't write to their
+    headers and dirty the shared pages.
+
+    The warm-up runs with one torch thread: a multi-threaded predict would
+    start libgomp's OpenMP thread pool in the master, and that pool does not
+    survive fork (workers would hang in their first parallel region).
+    """
+    import torch
+
+    load_models()
+    dummy = np.zeros((64, 64, 3), dtype=np.uint8)
+    threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    try:
+        for model in (missing_model, burnt_model):
+            if model is None:
+                continue
+            if hasattr(model, "model") and getattr(model, "model") is not None:
+                model.model.eval()
+                for param in model.model.parameters():
+                    param.requires_grad_(False)
+            if warmup:
+                model.predict(source=dummy, verbose=False, device=INFERENCE_DEVICE)
+    finally:
+        # Only sets the count for later parallel regions; no pool threads are started here.
+        torch.set_num_threads(threads)
+    gc.collect()
+    gc.freeze()
+    print("✅ Models frozen in master; workers will share weights copy-on-write.")
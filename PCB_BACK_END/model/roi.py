@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import math
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from utils import metrics
+from utils.offload import run_blocking
+
+from . import load_models as models_registry
+from .boxes import RawPrediction, empty_boxes, result_arrays
+from .config import (
+    INFERENCE_DEVICE,
+    MODEL_STRIDE,
+    PREDICT_IOU,
+    RAW_FLOOR_CONFIDENCE,
+    ROI_MAX_IMGSZ,
+    ROI_MIN_IMGSZ,
+    ROI_MIN_SIDE,
+)
+
+Region = Tuple[int, int, int, int]
+
+
+def clamp_region(roi: Sequence[float], width: int, height: int, normalized: bool = False) -> Region:
+    """Validate an [x1, y1, x2, y2] region (pixels, or 0..1 fractions) and clip it to the image."""
+    if not isinstance(roi, (list, tuple)) or len(roi) != 4:
+        raise ValueError("'roi' must be [x1, y1, x2, y2].")
+    try:
+        x1, y1, x2, y2 = (float(v) for v in roi)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("'roi' coordinates must be numbers.") from exc
+    if not all(math.isfinite(v) for v in (x1, y1, x2, y2)):
+        raise ValueError("'roi' coordinates must be finite numbers.")
+    if normalized:
+        x1, x2, y1, y2 = x1 * width, x2 * width, y1 * height, y2 * height
+    x1, x2 = sorted((int(max(0, min(width, x1))), int(max(0, min(width, x2)))))
+    y1, y2 = sorted((int(max(0, min(height, y1))), int(max(0, min(height, y2)))))
+    if x2 - x1 < ROI_MIN_SIDE or y2 - y1 < ROI_MIN_SIDE:
+        raise ValueError(f"Region of interest must be at least {ROI_MIN_SIDE}px on each side inside the image.")
+    return x1, y1, x2, y2
+
+
+def roi_imgsz(crop: np.ndarray) -> int:
+    """Inference size matching the crop's own resolution, within [ROI_MIN_IMGSZ, ROI_MAX_IMGSZ]."""
+    side = max(crop.shape[:2])
+    side = -(-side // MODEL_STRIDE) * MODEL_STRIDE
+    return int(min(max(side, ROI_MIN_IMGSZ), ROI_MAX_IMGSZ))
+
+
+def run_roi_detection_raw(model_name: str, crop: np.ndarray) -> RawPrediction:
+    """
+    Run one detector on a full-resolution crop without the 1500px downscale of
+    the whole-board path. Boxes are in crop coordinates, down to RAW_FLOOR_CONFIDENCE.
+    """
+    model = getattr(models_registry, f"{model_name}_model", None)
+    if model is None:
+        raise RuntimeError(f"{model_name.capitalize()} components model not loaded. Please restart the application.")
+
+    with metrics.stage("predict"):
+        results = run_blocking(
+            model.predict,
+            serialize=model_name,
+            source=crop,
+            imgsz=roi_imgsz(crop),
+            conf=RAW_FLOOR_CONFIDENCE,
+            iou=PREDICT_IOU,
+            verbose=False,
+            device=INFERENCE_DEVICE
+        )
+
+    if not results:
+        return empty_boxes(), {}
+    return result_arrays(results[0]), results[0].names or {}
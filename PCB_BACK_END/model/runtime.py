@@ -0,0 +1,103 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from .config import RUNTIME_TUNING
+
+
+def load_tuning(path: Path = RUNTIME_TUNING) -> Optional[Dict]:
+    """Read the autotune result file, or None when autotune has not been run."""
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def running_workers() -> int:
+    """Worker processes serving the app: $PCB_WORKER_COUNT (set by gunicorn.conf.py), else 1."""
+    return max(1, int(os.environ.get("PCB_WORKER_COUNT", "1")))
+
+
+def tuning_for_workers(tuning: Dict, workers: int) -> Optional[Dict]:
+    """
+    The tuned thread count / CPU sets for this many workers, or None when autotune
+    did not measure that worker count (a config tuned for 4 workers would leave
+    a single worker with a quarter of the CPUs).
+    """
+    entry = (tuning.get("by_workers") or {}).get(str(workers))
+    if entry is None:
+        return None
+    return {
+        "interop_threads": tuning.get("interop_threads", 1),
+        "opencv_threads": tuning.get("opencv_threads", 1),
+        **entry,
+    }
+
+
+def worker_cpus(tuning: Dict, worker_index: int) -> Optional[List[int]]:
+    """CPU set of a worker when pinning is enabled; None otherwise."""
+    cpu_sets = tuning.get("cpu_sets") or []
+    if not tuning.get("pin_cpus") or not cpu_sets:
+        return None
+    return list(cpu_sets[worker_index % len(cpu_sets)])
+
+
+def apply_thread_limits(
+    torch_threads: int,
+    interop_threads: int = 1,
+    opencv_threads: int = 1,
+    cpus: Optional[Sequence[int]] = None,
+) -> None:
+    """Limit torch/OpenCV thread pools (and optionally pin) for this process."""
+    if cpus:
+        try:
+            os.sched_setaffinity(0, set(cpus))
+        except (AttributeError, OSError) as exc:  # not Linux, or CPUs not available here
+            print(f"⚠️  Could not pin to CPUs {list(cpus)}: {exc}")
+
+    import cv2
+    import torch
+
+    torch.set_num_threads(max(1, int(torch_threads)))
+    try:
+        torch.set_num_interop_threads(max(1, int(interop_threads)))
+    except RuntimeError:
+        # Can only be set once, before any inter-op parallel work started.
+        pass
+    cv2.setNumThreads(max(0, int(opencv_threads)))
+
+
+def apply_runtime_tuning(worker_index: Optional[int] = None, workers: Optional[int] = None) -> Optional[Dict]:
+    """
+    Apply the model/runtime_tuning.json entry for the running worker count to
+    the current process. worker_index defaults to $PCB_WORKER_INDEX and workers
+    to $PCB_WORKER_COUNT (both set by gunicorn.conf.py). Without a matching
+    entry no thread limits or pinning are applied. PCB_TORCH_THREADS overrides
+    the torch thread count either way.
+    """
+    if workers is None:
+        workers = running_workers()
+    tuning = load_tuning()
+    entry = tuning_for_workers(tuning, workers) if tuning is not None else None
+    override = os.environ.get("PCB_TORCH_THREADS")
+    if tuning is not None and entry is None:
+        print(f"⚠️  runtime_tuning.json has no entry for {workers} worker(s); thread limits and pinning not applied.")
+    if entry is None and override is None:
+        return None
+    tuning = dict(entry or {})
+    if override is not None:
+        tuning["torch_threads"] = int(override)
+
+    if worker_index is None:
+        worker_index = int(os.environ.get("PCB_WORKER_INDEX", "0"))
+    cpus = worker_cpus(tuning, worker_index)
+    apply_thread_limits(
+        torch_threads=tuning.get("torch_threads", os.cpu_count() or 1),
+        interop_threads=tuning.get("interop_threads", 1),
+        opencv_threads=tuning.get("opencv_threads", 1),
+        cpus=cpus,
+    )
+    print(f"⚙️  Runtime tuning applied (worker {worker_index}): "
+          f"torch_threads={tuning.get('torch_threads')}, cpus={cpus or 'all'}")
+    return tuning
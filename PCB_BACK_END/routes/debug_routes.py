@@ -1,7 +1,10 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, current_app, jsonify, request
 import sys
 import os
 
+from utils import admission, memory, metrics, profiling
+from utils.response import error_response
+
 debug_bp = Blueprint('debug', __name__, url_prefix='/debug')
 
 @debug_bp.route('/health')
@@ -64,4 +67,73 @@ def status():
     except Exception as e:
         status_info["models_loaded_error"] = str(e)
 
+    status_info["admission"] = admission.controller.snapshot()
+
+    try:
+        from model import cascade
+        from model.config import CASCADE_ENABLED
+        status_info["cascade"] = {"enabled": CASCADE_ENABLED, "stats": cascade.stats()}
+    except Exception as e:
+        status_info["cascade_error"] = str(e)
+
+    for cache_name in ("result_cache", "session_images"):
+        cache = current_app.extensions.get(cache_name)
+        if cache is not None:
+            status_info[cache_name] = cache.stats()
+
     return jsonify(status_info)
+
+
+@debug_bp.route('/metrics')
+def prometheus_metrics():
+    """Per-stage latency, queue, memory and voltage ingest metrics in Prometheus text format"""
+    if not metrics.is_enabled():
+        return error_response("Metrics are disabled (PCB_METRICS=0).", status_code=404)
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+@debug_bp.route('/profiles')
+def list_profiles():
+    """Most recent profiling captures (newest first)"""
+    if not profiling.is_enabled():
+        return error_response("Profiling is disabled (set PCB_PROFILING=1).", status_code=404)
+    return jsonify({"success": True, "profiles": profiling.list_captures()})
+
+
+@debug_bp.route('/profiles/<int:capture_id>')
+def show_profile(capture_id):
+    """One capture with its hottest functions as pstats text (?sort=tottime&limit=60)"""
+    record = profiling.get_capture(capture_id) if profiling.is_enabled() else None
+    if record is None:
+        return error_response("Profile not found.", status_code=404)
+    sort = request.args.get("sort", "cumulative")
+    if sort not in ("cumulative", "tottime", "ncalls", "time"):
+        return error_response("Unsupported sort key.", status_code=400)
+    limit = request.args.get("limit", 40, type=int)
+    return jsonify({
+        "success": True,
+        "profile": profiling.summary(record),
+        "top_functions": profiling.top_functions(record, limit=limit, sort=sort),
+    })
+
+
+@debug_bp.route('/profiles/<int:capture_id>/download')
+def download_profile(capture_id):
+    """Raw cProfile stats, loadable with pstats.Stats(path) or snakeviz"""
+    record = profiling.get_capture(capture_id) if profiling.is_enabled() else None
+    if record is None:
+        return error_response("Profile not found.", status_code=404)
+    return Response(
+        profiling.raw_stats(record),
+        mimetype="application/octet-stream",
+        headers={"Content-Disposition": f"attachment; filename=pcb_profile_{capture_id}.prof"},
+    )
+
+
+@debug_bp.route('/memory')
+def memory_report():
+    """RSS/PSS/USS of every gunicorn worker, to check what an extra worker really costs"""
+    report = memory.workers_report()
+    report["pid"] = os.getpid()
+    report["preloaded"] = os.environ.get("PCB_PRELOAD") == "1"
+    return jsonify(report)
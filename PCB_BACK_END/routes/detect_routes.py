@@ -1,13 +1,20 @@
 # detect_routes.py
 import base64
-from typing import Callable, List, Union
+import secrets
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import cv2
 import numpy as np
-from flask import Blueprint, current_app, request
-
-from model.detect_burnt import run_burnt_detection
-from model.detect_missing import run_missing_detection
+from flask import Blueprint, current_app, request, session
+
+from model.boxes import RawPrediction, filter_detections
+from model.config import CONFIDENCE_THRESHOLD, RAW_FLOOR_CONFIDENCE
+from model.detect_burnt import run_burnt_detection_raw
+from model.detect_missing import run_missing_detection_raw
+from model.roi import clamp_region, run_roi_detection_raw
+from utils import metrics, profiling
+from utils.admission import DETECTION_LANE, admitted
 from utils.annotate import annotate_image
 from utils.response import error_response, success_response
 
@@ -15,6 +22,8 @@ from utils.response import error_response, success_response
 detect_bp = Blueprint("detect", __name__, url_prefix="/detect")
 
 ImageInput = np.ndarray
+RawHandler = Callable[[ImageInput], Tuple[RawPrediction, np.ndarray]]
+DETECTORS = ("missing", "burnt")
 
 
 # replace existing _resolve_image_input + _decode_base64_image + _process_request
@@ -34,7 +43,8 @@ def _resolve_image_input(payload: dict) -> ImageInput:
         file = request.files["image"]
         file_bytes = file.read()
         array = np.frombuffer(file_bytes, dtype=np.uint8)
-        image = cv2.imdecode(array, cv2.IMREAD_COLOR)
+        with metrics.stage("imdecode"):
+            image = cv2.imdecode(array, cv2.IMREAD_COLOR)
         if image is None:
             raise ValueError("Uploaded file could not be decoded as an image.")
         return image
@@ -42,7 +52,8 @@ def _resolve_image_input(payload: dict) -> ImageInput:
     # 3) If client sent raw bytes (rare)
     if request.data:
         array = np.frombuffer(request.data, dtype=np.uint8)
-        image = cv2.imdecode(array, cv2.IMREAD_COLOR)
+        with metrics.stage("imdecode"):
+            image = cv2.imdecode(array, cv2.IMREAD_COLOR)
         if image is not None:
             return image
 
@@ -53,21 +64,87 @@ def _decode_base64_image(image_base64: str) -> np.ndarray:
     if "," in image_base64:
         image_base64 = image_base64.split(",", 1)[1]
     try:
-        image_bytes = base64.b64decode(image_base64)
+        with metrics.stage("base64_decode"):
+            image_bytes = base64.b64decode(image_base64)
     except (base64.binascii.Error, ValueError) as exc:  # type: ignore[attr-defined]
         raise ValueError("Invalid base64 image data provided.") from exc
 
     array = np.frombuffer(image_bytes, dtype=np.uint8)
-    image = cv2.imdecode(array, cv2.IMREAD_COLOR)
+    with metrics.stage("imdecode"):
+        image = cv2.imdecode(array, cv2.IMREAD_COLOR)
     if image is None:
         raise ValueError("Could not decode base64 image data.")
     return image
 
 
-def _process_request(handler: Callable[[ImageInput], List[dict]], context: str):
+def start_inspect_session() -> None:
+    """
+    Give this browser a stable key (in the signed session cookie) for the session
+    image cache. Called when the result page is served, so only its requests keep
+    a full-resolution copy; cookie-less API clients never fill the cache.
+    """
+    if "inspect_key" not in session:
+        session["inspect_key"] = secrets.token_urlsafe(16)
+
+
+def _session_key() -> Optional[str]:
+    return session.get("inspect_key")
+
+
+def _to_upload_coords(detections: List[Dict], offset: Tuple[int, int] = (0, 0), scale: float = 1.0) -> List[Dict]:
+    """Map boxes on a resized board or an ROI crop back into full-resolution upload coordinates."""
+    dx, dy = offset
+    if not dx and not dy and scale == 1.0:
+        return detections
+    return [
+        {**det, "bbox": [
+            int(round(det["bbox"][0] * scale)) + dx,
+            int(round(det["bbox"][1] * scale)) + dy,
+            int(round(det["bbox"][2] * scale)) + dx,
+            int(round(det["bbox"][3] * scale)) + dy,
+        ]}
+        for det in detections
+    ]
+
+
+def _process_request(handler: Callable, context: str, runner: Optional[Callable] = None):
+    """Entry point for detection routes; optionally captures a cProfile trace (see /debug/profiles)."""
+    runner = runner or _run_detection
+    if profiling.should_capture(request.headers):
+        with profiling.capture(request.path, context) as record:
+            response = _measured_detection(handler, context, runner)
+            record["status"] = response[1]
+        return response
+    return _measured_detection(handler, context, runner)
+
+
+def _measured_detection(handler: Callable, context: str, runner: Callable):
+    """
+    Instrumented wrapper around the detection runner: records per-stage timings,
+    the end-to-end latency and the in-flight gauge for /debug/metrics.
+    """
+    if not metrics.is_enabled():
+        return runner(handler, context)
+
+    start = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+    status = 500
+    try:
+        with metrics.request_labels(request.path, context):
+            response = runner(handler, context)
+        status = response[1]
+        return response
+    finally:
+        metrics.IN_FLIGHT.dec()
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, request.path, context, str(status))
+
+
+def _run_detection(handler: RawHandler, context: str):
     """
     Robust request processor:
      - Accepts JSON base64 or file uploads
+     - Caches the raw (floor-confidence) boxes for /detect/rethreshold
+     - Keeps the decoded full-resolution image for /detect/roi
      - Returns JSON (success_response/error_response)
     """
     try:
@@ -76,15 +153,31 @@ def _process_request(handler: Callable[[ImageInput], List[dict]], context: str):
         # If it's None (because form-data was used) pass empty dict so _resolve_image_input checks files
         payload = payload or {}
         image_input = _resolve_image_input(payload)
-        detections, processed_image = handler(image_input)
+        profiling.note(input_shape=list(image_input.shape))
+        height, width = image_input.shape[:2]
+        raw, processed_image = handler(image_input)
+        # Kept for /detect/roi only once detection succeeded, so failures don't pin the upload
+        key = _session_key()
+        roi_available = key is not None and current_app.extensions["session_images"].put(key, context, image_input)
+        # Large boards are downscaled for inference; boxes are reported in upload pixels,
+        # like /detect/roi, while the annotated image stays at the processed size.
+        scale = width / processed_image.shape[1]
+        with metrics.stage("format"):
+            detections = filter_detections(raw, CONFIDENCE_THRESHOLD)
+        result_id = current_app.extensions["result_cache"].put(context, raw, processed_image, scale=scale)
         current_app.logger.info(f"Detections for '{context}': {detections}")
         annotated = annotate_image(processed_image, detections)
 
-        return success_response({
-            "image_base64": annotated,
-            "detections": detections
-        })
-        return success_response({"image_base64": image_base64, "detections": detections})
+        with metrics.stage("serialize"):
+            return success_response({
+                "image_base64": annotated,
+                "detections": _to_upload_coords(detections, scale=scale),
+                "result_id": result_id,
+                "confidence": CONFIDENCE_THRESHOLD,
+                "floor_confidence": RAW_FLOOR_CONFIDENCE,
+                "image_size": [width, height],
+                "roi_available": roi_available,
+            })
     except ValueError as ve:
         current_app.logger.warning("Validation error on %s detection: %s", context, ve)
         return error_response(str(ve), status_code=400)
@@ -94,13 +187,113 @@ def _process_request(handler: Callable[[ImageInput], List[dict]], context: str):
         return error_response("Internal server error during detection. See server logs.", status_code=500)
 
 @detect_bp.route("/missing", methods=["POST"])
+@admitted(DETECTION_LANE)
 def detect_missing():
-    return _process_request(run_missing_detection, "missing")
+    return _process_request(run_missing_detection_raw, "missing")
 
 
 @detect_bp.route("/burnt", methods=["POST"])
+@admitted(DETECTION_LANE)
 def detect_burnt():
-    return _process_request(run_burnt_detection, "burnt")
+    return _process_request(run_burnt_detection_raw, "burnt")
+
+
+@detect_bp.route("/rethreshold", methods=["POST"])
+def rethreshold():
+    """
+    Re-filter a cached detection result without re-running the model.
+    Body: {"result_id": "...", "confidence": 0.4, "classes": ["R12", 3], "iou": 0.5}
+    "classes" (labels or class ids) and "iou" (re-run NMS) are optional; thresholds
+    below RAW_FLOOR_CONFIDENCE return the floor boxes.
+    """
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return error_response("Request body must be a JSON object.", status_code=400)
+    entry = current_app.extensions["result_cache"].get(str(payload.get("result_id") or ""))
+    if entry is None:
+        return error_response("Result expired or unknown; run detection again.", status_code=404)
+
+    try:
+        confidence = float(payload.get("confidence", CONFIDENCE_THRESHOLD))
+        iou = payload.get("iou")
+        iou = float(iou) if iou is not None else None
+    except (TypeError, ValueError):
+        return error_response("'confidence' and 'iou' must be numbers.", status_code=400)
+    if not 0.0 <= confidence <= 1.0 or (iou is not None and not 0.0 < iou <= 1.0):
+        return error_response("'confidence' must be in [0, 1] and 'iou' in (0, 1].", status_code=400)
+    classes = payload.get("classes")
+    if classes is not None and not isinstance(classes, list):
+        return error_response("'classes' must be a list of labels or class ids.", status_code=400)
+
+    with metrics.request_labels(request.path, entry.model):
+        with metrics.stage("format"):
+            detections = filter_detections(entry.raw, confidence, classes=classes, iou=iou)
+        annotated = annotate_image(entry.image, detections)
+        with metrics.stage("serialize"):
+            return success_response({
+                "image_base64": annotated,
+                "detections": _to_upload_coords(detections, entry.offset, entry.scale),
+                "result_id": payload["result_id"],
+                "confidence": confidence,
+                "floor_confidence": RAW_FLOOR_CONFIDENCE,
+                "iou": iou,
+            })
+
+
+def _run_roi_detection(handler: Callable[[str, np.ndarray], RawPrediction], context: str):
+    """
+    Re-inspect a region of the session's last upload at native resolution.
+    Returns the annotated crop, with detection boxes in full-image coordinates.
+    """
+    key = _session_key()
+    entry = current_app.extensions["session_images"].get(key) if key else None
+    if entry is None:
+        return error_response("No cached image for this session; upload the board image again.", status_code=404)
+    try:
+        payload = request.get_json(silent=True) or {}
+        height, width = entry.image.shape[:2]
+        x1, y1, x2, y2 = clamp_region(
+            payload.get("roi") or [], width, height, normalized=bool(payload.get("normalized"))
+        )
+        crop = entry.image[y1:y2, x1:x2].copy()  # a copy, so cached results don't pin the full image
+        profiling.note(input_shape=list(crop.shape), roi=[x1, y1, x2, y2])
+        raw = handler(context, crop)
+        with metrics.stage("format"):
+            detections = filter_detections(raw, CONFIDENCE_THRESHOLD)
+        result_id = current_app.extensions["result_cache"].put(context, raw, crop, offset=(x1, y1))
+        annotated = annotate_image(crop, detections)
+
+        with metrics.stage("serialize"):
+            return success_response({
+                "image_base64": annotated,
+                "detections": _to_upload_coords(detections, (x1, y1)),
+                "roi": [x1, y1, x2, y2],
+                "image_size": [width, height],
+                "result_id": result_id,
+                "confidence": CONFIDENCE_THRESHOLD,
+                "floor_confidence": RAW_FLOOR_CONFIDENCE,
+            })
+    except ValueError as ve:
+        current_app.logger.warning("Validation error on %s ROI detection: %s", context, ve)
+        return error_response(str(ve), status_code=400)
+    except Exception as exc:  # pylint: disable=broad-except
+        current_app.logger.exception("Failed to process %s ROI detection: %s", context, exc)
+        return error_response("Internal server error during detection. See server logs.", status_code=500)
+
+
+@detect_bp.route("/roi", methods=["POST"])
+@admitted(DETECTION_LANE)
+def detect_roi():
+    """
+    Run one detector on a region of this session's last uploaded image.
+    Body: {"model": "missing" | "burnt", "roi": [x1, y1, x2, y2], "normalized": false}
+    "roi" is in full-resolution pixels, or 0..1 fractions of the image when "normalized" is true.
+    """
+    payload = request.get_json(silent=True) or {}
+    model_name = payload.get("model") if isinstance(payload, dict) else None
+    if model_name not in DETECTORS:
+        return error_response(f"'model' must be one of: {', '.join(DETECTORS)}.", status_code=400)
+    return _process_request(run_roi_detection_raw, model_name, runner=_run_roi_detection)
 
 
 # -------------------------------------------------------------------------
@@ -115,6 +308,10 @@ SYSTEM_STATE = {
     "failed_point": None
 }
 
+# Latest reading per point of the current sweep, attached to diagnosis reports
+# (POST /reports with "include_bench_sweep": true). Cleared on reset_sequence.
+LATEST_SWEEP = {}
+
 # Expected voltages map (derived from fifth_page.html)
 EXPECTED_VOLTAGES = {
     "A1": 0.0, "A2": 0.0, "A3": 0.0, "A4": 0.0, "A5": 0.0, "A6": 0.0, "A7": 0.0, "A8": 0.0, "A9": 0.0,
@@ -152,11 +349,13 @@ def detect_esp_voltage():
     Receives voltage data from ESP32.
     Format: {"point": "A1", "value": 3.28}
     """
+    start = time.perf_counter()
     data = request.get_json(silent=True) or {}
     point = data.get("point")
     value = data.get("value")
 
     if point is None or value is None:
+        metrics.VOLTAGE_INGEST_TOTAL.inc("INVALID")
         return error_response("Missing 'point' or 'value'", status_code=400)
 
     # Determine Status
@@ -182,6 +381,10 @@ def detect_esp_voltage():
         "expected": expected
     }, namespace="/", broadcast=True)
 
+    LATEST_SWEEP[point] = {"point": point, "value": round(float(value), 3), "expected": expected, "status": status}
+    metrics.VOLTAGE_INGEST_TOTAL.inc(status)
+    metrics.VOLTAGE_INGEST_SECONDS.observe(time.perf_counter() - start)
+
     # Control Logic
     if status == "NOT OK":
         SYSTEM_STATE["paused"] = True
@@ -220,6 +423,7 @@ reset_flag = False
 def reset_sequence():
     global reset_flag
     reset_flag = True
+    LATEST_SWEEP.clear()
     return {"success": True}
 
 @detect_bp.route('/check_reset', methods=['GET'])
@@ -0,0 +1,99 @@
+import os
+
+from flask import Blueprint, current_app, request, send_file, url_for
+
+from model.load_models import model_versions
+from routes.detect_routes import LATEST_SWEEP
+from utils.report_store import ReportStore
+from utils.response import error_response, success_response
+
+
+report_bp = Blueprint("reports", __name__, url_prefix="/reports")
+
+IMAGE_MAX_AGE = 365 * 24 * 3600  # content-addressed, never changes
+
+
+def _store() -> ReportStore:
+    return current_app.extensions["report_store"]
+
+
+def _sniff_mimetype(path: str) -> str:
+    # Full-resolution files are stored exactly as uploaded (JPEG, PNG or BMP).
+    with open(path, "rb") as handle:
+        head = handle.read(8)
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head.startswith(b"BM"):
+        return "image/bmp"
+    return "image/jpeg"
+
+
+def _with_image_urls(report: dict) -> dict:
+    if report.get("thumb_hash"):
+        report["thumbnail_url"] = url_for("reports.report_image", image_hash=report["thumb_hash"], tier="thumb")
+    for image in report.get("images", {}).values():
+        image["thumbnail_url"] = url_for("reports.report_image", image_hash=image["hash"], tier="thumb")
+        image["full_url"] = url_for("reports.report_image", image_hash=image["hash"], tier="full")
+    return report
+
+
+@report_bp.route("", methods=["POST"])
+def create_report():
+    """
+    Persist one board's diagnosis.
+    Body: {"board_serial": "...", "board_type": "...", "technician": "...", "notes": "...",
+           "missing": {"detections": [...], "image_base64": "..."},
+           "burnt":   {"detections": [...], "image_base64": "..."},
+           "voltage": [{"point": "A1", "value": 0.01, "expected": 0.0, "status": "OK"}, ...],
+           "include_bench_sweep": true}
+    """
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return error_response("Report body must be a JSON object.", status_code=400)
+    if payload.get("include_bench_sweep") and not payload.get("voltage"):
+        payload["voltage"] = list(LATEST_SWEEP.values())
+    try:
+        report_id = _store().create_report(payload, model_versions=model_versions())
+    except ValueError as ve:
+        return error_response(str(ve), status_code=400)
+    except Exception as exc:  # pylint: disable=broad-except
+        current_app.logger.exception("Failed to store diagnosis report: %s", exc)
+        return error_response("Internal server error while saving the report.", status_code=500)
+    return success_response({"report_id": report_id}, status_code=201)
+
+
+@report_bp.route("", methods=["GET"])
+def list_reports():
+    """Newest-first page of reports. Filters: serial, board_type, label, since, until; paging: cursor, limit."""
+    page = _store().list_reports(
+        board_serial=request.args.get("serial"),
+        board_type=request.args.get("board_type"),
+        label=request.args.get("label"),
+        since=request.args.get("since"),
+        until=request.args.get("until"),
+        cursor=request.args.get("cursor", type=int),
+        limit=request.args.get("limit", 50, type=int),
+    )
+    page["reports"] = [_with_image_urls(report) for report in page["reports"]]
+    return success_response(page)
+
+
+@report_bp.route("/<int:report_id>", methods=["GET"])
+def get_report(report_id):
+    report = _store().get_report(report_id)
+    if report is None:
+        return error_response("Report not found.", status_code=404)
+    return success_response({"report": _with_image_urls(report)})
+
+
+@report_bp.route("/images/<image_hash>", methods=["GET"])
+def report_image(image_hash):
+    tier = request.args.get("tier", "thumb")
+    if tier not in ("thumb", "full") or len(image_hash) != 64 or not all(c in "0123456789abcdef" for c in image_hash):
+        return error_response("Invalid image reference.", status_code=400)
+    path = _store().image_path(image_hash, tier)
+    if not os.path.isfile(path):
+        return error_response("Image not found.", status_code=404)
+    response = send_file(path, mimetype=_sniff_mimetype(path), max_age=IMAGE_MAX_AGE, etag=image_hash)
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The backend imports its packages top-level (utils, model, routes), as when run from PCB_BACK_END/.
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
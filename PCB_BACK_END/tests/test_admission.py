@@ -0,0 +1,124 @@
+import threading
+
+import pytest
+from flask import Flask
+
+from utils import admission
+from utils.admission import DETECTION_LANE, AdmissionController, Overloaded, admitted
+
+
+def _controller(**kwargs) -> AdmissionController:
+    kwargs.setdefault("rss_reader", lambda: 0.0)
+    return AdmissionController(**kwargs)
+
+
+def test_admits_up_to_max_concurrent():
+    controller = _controller(max_concurrent=2, max_queue=0)
+    with controller.detection_slot(), controller.detection_slot():
+        assert controller.snapshot()["active"] == 2
+    assert controller.snapshot()["active"] == 0
+
+
+def test_rejects_when_queue_is_full():
+    controller = _controller(max_concurrent=1, max_queue=0)
+    with controller.detection_slot():
+        with pytest.raises(Overloaded) as exc:
+            with controller.detection_slot():
+                pass
+    assert exc.value.reason == "queue_full"
+
+
+def test_rejects_after_queue_timeout():
+    controller = _controller(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+    with controller.detection_slot():
+        with pytest.raises(Overloaded) as exc:
+            with controller.detection_slot():
+                pass
+    assert exc.value.reason == "queue_timeout"
+    assert controller.snapshot()["waiting"] == 0
+
+
+def test_queued_request_runs_when_slot_frees():
+    controller = _controller(max_concurrent=1, max_queue=1, queue_timeout=5)
+    admitted_event = threading.Event()
+
+    def waiter():
+        with controller.detection_slot():
+            admitted_event.set()
+
+    with controller.detection_slot():
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        assert not admitted_event.wait(0.05)
+    thread.join(timeout=5)
+    assert admitted_event.is_set()
+
+
+def test_rejects_over_memory_ceiling():
+    rss = {"value": 2e9}
+    controller = _controller(max_rss_bytes=1e9, rss_reader=lambda: rss["value"])
+    with pytest.raises(Overloaded) as exc:
+        with controller.detection_slot():
+            pass
+    assert exc.value.reason == "memory"
+
+    rss["value"] = 5e8
+    with controller.detection_slot():
+        pass
+
+
+def test_retry_after_scales_with_backlog_and_service_time():
+    controller = _controller(max_concurrent=1, max_queue=0)
+    controller._service_ewma = 2.0
+    with controller.detection_slot():
+        with pytest.raises(Overloaded) as exc:
+            with controller.detection_slot():
+                pass
+    # One active request plus this one, 2 s each.
+    assert exc.value.retry_after == 4
+
+
+def test_retry_after_is_at_least_one_second():
+    controller = _controller(max_concurrent=4, max_queue=0, max_rss_bytes=1.0, rss_reader=lambda: 2.0)
+    controller._service_ewma = 0.01
+    with pytest.raises(Overloaded) as exc:
+        with controller.detection_slot():
+            pass
+    assert exc.value.retry_after == 1
+
+
+def test_admitted_view_returns_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(admission, "controller", _controller(max_rss_bytes=1.0, rss_reader=lambda: 2.0))
+    app = Flask(__name__)
+
+    @app.route("/detect", methods=["POST"])
+    @admitted(DETECTION_LANE)
+    def detect():
+        return {"success": True}
+
+    response = app.test_client().post("/detect")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert response.get_json()["error"]["reason"] == "memory"
+
+
+def test_memory_pressure_hook_can_avoid_the_rejection():
+    rss = {"value": 2e9}
+    shed_calls = []
+
+    def shed():
+        shed_calls.append(True)
+        rss["value"] = 5e8
+
+    controller = _controller(max_rss_bytes=1e9, rss_reader=lambda: rss["value"], on_memory_pressure=shed)
+    with controller.detection_slot():
+        pass
+    assert shed_calls == [True]
+
+
+def test_rejects_when_memory_pressure_hook_frees_too_little():
+    controller = _controller(max_rss_bytes=1e9, rss_reader=lambda: 2e9, on_memory_pressure=lambda: None)
+    with pytest.raises(Overloaded) as exc:
+        with controller.detection_slot():
+            pass
+    assert exc.value.reason == "memory"
@@ -0,0 +1,21 @@
+from flask import Flask
+
+from utils.assets import init_assets
+
+
+def _app(tmp_path):
+    static = tmp_path / "static"
+    static.mkdir()
+    (static / "style.css").write_text("body { color: red; }")
+    app = Flask(__name__, static_folder=str(static))
+    init_assets(app)
+    return app
+
+
+def test_unknown_static_files_are_not_cached(tmp_path):
+    app = _app(tmp_path)
+    client = app.test_client()
+    for index in range(50):
+        assert client.get(f"/static/missing-{index}.css").status_code == 404
+    assert client.get("/static/style.css").status_code == 200
+    assert list(app.extensions["pcb_asset_variants"]) == ["style.css"]
@@ -0,0 +1,157 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+
+from model import cascade
+from model.boxes import nms
+from model.config import CASCADE_ESCALATE_MARGIN, CASCADE_REFINE_IMGSZ, CONFIDENCE_THRESHOLD, RAW_FLOOR_CONFIDENCE
+
+
+def _boxes(rows):
+    """rows of (x1, y1, x2, y2, conf, cls)"""
+    array = np.array(rows, dtype=np.float32).reshape(-1, 6)
+    return array[:, :4], array[:, 4], array[:, 5].astype(np.int64)
+
+
+def test_nms_suppresses_overlaps_within_a_class_only():
+    boxes = _boxes([
+        (0, 0, 100, 100, 0.9, 0),
+        (5, 5, 100, 100, 0.8, 0),   # IoU 0.9 with the first
+        (5, 5, 100, 100, 0.7, 1),   # same place, other class
+        (200, 200, 300, 300, 0.6, 0),
+    ])
+    xyxy, conf, cls = nms(boxes, 0.7)
+    assert conf.tolist() == pytest.approx([0.9, 0.7, 0.6])
+    assert cls.tolist() == [0, 1, 0]
+
+
+def test_nms_keeps_overlaps_below_threshold():
+    # IoU = 50*100 / (2*100*100 - 50*100) = 1/3
+    boxes = _boxes([(0, 0, 100, 100, 0.9, 0), (50, 0, 150, 100, 0.8, 0)])
+    assert len(nms(boxes, 0.7)[1]) == 2
+    assert len(nms(boxes, 0.3)[1]) == 1
+
+
+def _average_pixels(budget, escalation_rate):
+    # The refine call's fixed overhead is charged as one crop
+    return cascade.CASCADE_COARSE_IMGSZ ** 2 + escalation_rate * (budget + 1) * CASCADE_REFINE_IMGSZ ** 2
+
+
+@pytest.mark.parametrize("escalation_rate", [1.0, 0.5, 0.25])
+def test_crop_budget_keeps_the_average_request_within_one_default_predict(escalation_rate):
+    budget = cascade.crop_budget(escalation_rate)
+    assert budget >= 1
+    assert _average_pixels(budget, escalation_rate) <= cascade.DEFAULT_IMGSZ ** 2
+    if budget < cascade.CASCADE_MAX_CROPS:
+        assert _average_pixels(budget + 1, escalation_rate) > cascade.DEFAULT_IMGSZ ** 2
+
+
+def test_rarer_escalation_buys_more_crops():
+    assert cascade.crop_budget(0.25) > cascade.crop_budget(0.5) > cascade.crop_budget(1.0)
+
+
+def test_large_coarse_size_keeps_a_minimum_crop(monkeypatch):
+    monkeypatch.setattr(cascade, "CASCADE_COARSE_IMGSZ", cascade.DEFAULT_IMGSZ)
+    assert cascade.crop_budget(1.0) == cascade.CASCADE_MIN_CROPS
+
+
+def test_expected_escalation_rate_moves_from_the_prior_to_observed(monkeypatch):
+    monkeypatch.setattr(cascade, "_stats", {})
+    assert cascade.expected_escalation_rate("m") == pytest.approx(cascade.CASCADE_PRIOR_ESCALATION)
+    cascade._stats["m"] = {"runs": 1000, "escalated": 100, "crops": 300}
+    assert cascade.expected_escalation_rate("m") == pytest.approx(0.1, abs=0.01)
+
+
+def test_no_escalation_for_confident_large_boxes():
+    coarse = _boxes([(100, 100, 200, 200, 0.9, 0)])
+    assert cascade._escalation_regions(coarse, 1500, 1125, max_crops=2) == []
+
+
+def test_uncertain_boxes_escalate_least_confident_first_within_budget():
+    coarse = _boxes([
+        (100, 100, 200, 200, 0.45, 0),
+        (1000, 800, 1100, 900, 0.30, 0),
+        (600, 400, 700, 500, 0.40, 0),
+    ])
+    regions = cascade._escalation_regions(coarse, 1500, 1125, max_crops=2)
+    assert len(regions) == 2
+    crop = CASCADE_REFINE_IMGSZ
+    first_center = ((regions[0][0] + regions[0][2]) / 2, (regions[0][1] + regions[0][3]) / 2)
+    assert first_center == (1050, 850)
+    for x1, y1, x2, y2 in regions:
+        assert (x2 - x1, y2 - y1) == (crop, crop)
+
+
+def test_regions_are_clamped_inside_the_image():
+    coarse = _boxes([(0, 0, 10, 10, 0.3, 0), (1490, 1115, 1500, 1125, 0.3, 0)])
+    for x1, y1, x2, y2 in cascade._escalation_regions(coarse, 1500, 1125, max_crops=2):
+        assert 0 <= x1 < x2 <= 1500 and 0 <= y1 < y2 <= 1125
+
+
+def test_boxes_inside_an_existing_crop_do_not_add_crops():
+    coarse = _boxes([(100, 100, 120, 120, 0.3, 0), (110, 110, 130, 130, 0.35, 0)])
+    assert len(cascade._escalation_regions(coarse, 1500, 1125, max_crops=2)) == 1
+
+
+def test_zero_budget_disables_escalation():
+    coarse = _boxes([(100, 100, 200, 200, 0.3, 0)])
+    assert cascade._escalation_regions(coarse, 1500, 1125, max_crops=0) == []
+
+
+def test_to_image_coords_shifts_and_drops_boxes_cut_by_inner_edges():
+    region = (320, 320, 640, 640)
+    crop_boxes = _boxes([
+        (10, 10, 50, 50, 0.9, 0),     # well inside
+        (0, 100, 40, 140, 0.8, 0),    # touches the crop's left edge (inside the image)
+        (280, 280, 320, 320, 0.7, 0), # touches the right/bottom edges
+    ])
+    xyxy, conf, _ = cascade._to_image_coords(crop_boxes, region, 1500, 1125)
+    assert xyxy.tolist() == [[330, 330, 370, 370]]
+    assert conf.tolist() == pytest.approx([0.9])
+
+
+def test_to_image_coords_keeps_boxes_on_image_borders():
+    region = (0, 0, 320, 320)
+    crop_boxes = _boxes([(0, 0, 40, 40, 0.9, 0)])
+    xyxy, _, _ = cascade._to_image_coords(crop_boxes, region, 1500, 1125)
+    assert xyxy.tolist() == [[0, 0, 40, 40]]
+
+
+class _FakeBoxes:
+    def __init__(self, rows):
+        xyxy, conf, cls = _boxes(rows)
+        self.xyxy, self.conf, self.cls = torch.from_numpy(xyxy), torch.from_numpy(conf), torch.from_numpy(cls)
+
+    def __len__(self):
+        return len(self.conf)
+
+
+class _FakeModel:
+    """Returns the same boxes for every image and records the imgsz of each predict call."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def predict(self, source, imgsz, **kwargs):
+        self.calls.append(imgsz)
+        sources = source if isinstance(source, list) else [source]
+        return [SimpleNamespace(names={0: "R"}, boxes=_FakeBoxes(self.rows)) for _ in sources]
+
+
+def test_raw_floor_boxes_are_returned_but_never_escalated():
+    image = np.zeros((1125, 1500, 3), dtype=np.uint8)
+    model = _FakeModel([(100, 100, 110, 110, 0.06, 0)])  # small, low-confidence noise
+    boxes, _ = cascade.run_cascade(model, image, RAW_FLOOR_CONFIDENCE, "test")
+    assert model.calls == [cascade.CASCADE_COARSE_IMGSZ]
+    assert boxes[1].tolist() == pytest.approx([0.06])
+
+
+def test_boxes_near_the_threshold_are_escalated():
+    image = np.zeros((1125, 1500, 3), dtype=np.uint8)
+    in_band = CONFIDENCE_THRESHOLD - CASCADE_ESCALATE_MARGIN / 2
+    model = _FakeModel([(100, 100, 200, 200, in_band, 0)])
+    cascade.run_cascade(model, image, RAW_FLOOR_CONFIDENCE, "test")
+    assert model.calls == [cascade.CASCADE_COARSE_IMGSZ, CASCADE_REFINE_IMGSZ]
@@ -0,0 +1,163 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+from flask import Flask
+
+from model.boxes import empty_boxes
+from routes import detect_routes
+from utils.result_cache import ResultCache, SessionImageCache
+
+
+def _downscaling_detector(image):
+    """Stands in for run_*_detection_raw: halves the board and finds one box on the result."""
+    height, width = image.shape[:2]
+    processed = cv2.resize(image, (width // 2, height // 2))
+    boxes = (
+        np.array([[100, 50, 200, 150]], dtype=np.float32),
+        np.array([0.9], dtype=np.float32),
+        np.array([0], dtype=np.int64),
+    )
+    return (boxes, {0: "R1"}), processed
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(detect_routes, "run_missing_detection_raw", _downscaling_detector)
+    monkeypatch.setattr(detect_routes, "run_roi_detection_raw", lambda model_name, crop: (empty_boxes(), {}))
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test"
+    app.extensions["result_cache"] = ResultCache(max_bytes=64 * 1024 * 1024, ttl_seconds=60)
+    app.extensions["session_images"] = SessionImageCache(max_bytes=64 * 1024 * 1024, ttl_seconds=60)
+    app.register_blueprint(detect_routes.detect_bp)
+
+    @app.route("/missing")
+    def result_page():
+        detect_routes.start_inspect_session()
+        return ""
+
+    return app.test_client()
+
+
+def _upload(client, width=3000, height=2000):
+    ok, buffer = cv2.imencode(".png", np.zeros((height, width, 3), dtype=np.uint8))
+    assert ok
+    return client.post("/detect/missing", data={"image": (io.BytesIO(buffer.tobytes()), "board.png")})
+
+
+def test_whole_board_boxes_are_in_upload_coordinates(client):
+    data = _upload(client).get_json()
+    assert data["image_size"] == [3000, 2000]
+    assert data["detections"][0]["bbox"] == [200, 100, 400, 300]
+
+
+def test_rethreshold_keeps_upload_coordinates(client):
+    result_id = _upload(client).get_json()["result_id"]
+    data = client.post("/detect/rethreshold", json={"result_id": result_id, "confidence": 0.5}).get_json()
+    assert data["detections"][0]["bbox"] == [200, 100, 400, 300]
+
+
+def test_to_upload_coords_scales_then_offsets():
+    detections = [{"label": "R1", "bbox": [10, 20, 30, 40]}]
+    assert detect_routes._to_upload_coords(detections, (5, 7), 1.5)[0]["bbox"] == [20, 37, 50, 67]
+    assert detect_routes._to_upload_coords(detections) is detections
+
+
+def test_cookieless_uploads_do_not_keep_a_full_resolution_copy(client):
+    data = _upload(client).get_json()
+    assert data["roi_available"] is False
+    assert client.application.extensions["session_images"].stats()["entries"] == 0
+
+
+def test_result_page_session_keeps_the_upload_for_roi(client):
+    client.get("/missing")
+    assert _upload(client).get_json()["roi_available"] is True
+    response = client.post("/detect/roi", json={"model": "missing", "roi": [0, 0, 1000, 1000]})
+    assert response.status_code == 200
+
+
+def _overlapping_detector(image):
+    """Full-size result with two overlapping R1 boxes, a C2 box and one floor-confidence C2 box."""
+    boxes = (
+        np.array([[0, 0, 100, 100], [5, 5, 100, 100], [300, 300, 400, 400], [600, 600, 700, 700]], dtype=np.float32),
+        np.array([0.9, 0.6, 0.4, 0.1], dtype=np.float32),
+        np.array([0, 0, 1, 1], dtype=np.int64),
+    )
+    return (boxes, {0: "R1", 1: "C2"}), image
+
+
+@pytest.fixture
+def rethreshold(client, monkeypatch):
+    """Uploads one board through the overlapping detector and returns a rethreshold caller for its result."""
+    monkeypatch.setattr(detect_routes, "run_missing_detection_raw", _overlapping_detector)
+    result_id = _upload(client, width=800, height=800).get_json()["result_id"]
+
+    def call(**body):
+        return client.post("/detect/rethreshold", json={"result_id": result_id, **body})
+
+    return call
+
+
+def _confidences(response):
+    assert response.status_code == 200
+    return [d["confidence"] for d in response.get_json()["detections"]]
+
+
+@pytest.mark.parametrize("confidence, expected", [
+    (0.05, [0.9, 0.6, 0.4, 0.1]),
+    (0.25, [0.9, 0.6, 0.4]),
+    (0.5, [0.9, 0.6]),
+    (0.95, []),
+])
+def test_rethreshold_filters_by_confidence(rethreshold, confidence, expected):
+    assert _confidences(rethreshold(confidence=confidence)) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("classes", [["C2"], [1], ["1"]])
+def test_rethreshold_selects_classes_by_label_or_id(rethreshold, classes):
+    detections = rethreshold(confidence=0.05, classes=classes).get_json()["detections"]
+    assert [(d["label"], d["label_id"]) for d in detections] == [("C2", 1), ("C2", 1)]
+
+
+def test_rethreshold_reruns_nms_with_iou(rethreshold):
+    assert _confidences(rethreshold(confidence=0.25)) == pytest.approx([0.9, 0.6, 0.4])
+    # The R1 pair overlaps at IoU ~0.9: kept at iou=0.95, merged at 0.5
+    assert _confidences(rethreshold(confidence=0.25, iou=0.95)) == pytest.approx([0.9, 0.6, 0.4])
+    assert _confidences(rethreshold(confidence=0.25, iou=0.5)) == pytest.approx([0.9, 0.4])
+
+
+@pytest.mark.parametrize("body", [
+    {"confidence": "high"},
+    {"confidence": 1.5},
+    {"confidence": -0.1},
+    {"iou": "tight"},
+    {"iou": 0},
+    {"iou": 1.2},
+    {"classes": "R1"},
+    {"classes": {"R1": True}},
+])
+def test_rethreshold_rejects_bad_parameters(rethreshold, body):
+    response = rethreshold(**body)
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+def test_rethreshold_unknown_result_is_404(client):
+    response = client.post("/detect/rethreshold", json={"result_id": "nope", "confidence": 0.5})
+    assert response.status_code == 404
+
+
+def test_rethreshold_expired_result_is_404(client, rethreshold):
+    client.application.extensions["result_cache"].ttl_seconds = -1  # everything is past its TTL
+    assert rethreshold(confidence=0.5).status_code == 404
+
+
+def test_failed_detection_does_not_keep_the_upload(client, monkeypatch):
+    def broken_detector(image):
+        raise RuntimeError("model crashed")
+
+    client.get("/missing")
+    monkeypatch.setattr(detect_routes, "run_missing_detection_raw", broken_detector)
+    assert _upload(client).status_code == 500
+    assert client.application.extensions["session_images"].stats()["entries"] == 0
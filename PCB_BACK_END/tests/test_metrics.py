@@ -0,0 +1,83 @@
+import pytest
+from flask import Flask
+
+from routes.debug_routes import debug_bp
+from utils import metrics
+
+
+@pytest.fixture(autouse=True)
+def _restore_enabled():
+    enabled = metrics.is_enabled()
+    yield
+    metrics.set_enabled(enabled)
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    metrics.set_enabled(True)
+    histogram = metrics.Histogram("t_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "decode")
+    histogram.observe(0.5, "decode")
+    histogram.observe(3.0, "decode")
+    assert histogram.render() == [
+        "# HELP t_seconds Test.",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{stage="decode",le="0.1"} 1',
+        't_seconds_bucket{stage="decode",le="1"} 2',
+        't_seconds_bucket{stage="decode",le="+Inf"} 3',
+        't_seconds_sum{stage="decode"} 3.55',
+        't_seconds_count{stage="decode"} 3',
+    ]
+
+
+def test_label_values_are_escaped():
+    metrics.set_enabled(True)
+    counter = metrics.Counter("t_total", "Test.", ("path",))
+    counter.inc('a"b\\c\nd')
+    assert counter.render()[-1] == 't_total{path="a\\"b\\\\c\\nd"} 1'
+
+
+def test_stage_uses_request_labels():
+    metrics.set_enabled(True)
+    seen = []
+    listener = lambda name, elapsed: seen.append(name)
+    metrics.add_stage_listener(listener)
+    try:
+        with metrics.request_labels("/detect/missing", "missing"):
+            with metrics.stage("t_stage_labelled"):
+                pass
+        with metrics.stage("t_stage_direct"):
+            pass
+    finally:
+        metrics.remove_stage_listener(listener)
+    rendered = "\n".join(metrics.STAGE_SECONDS.render())
+    assert 'endpoint="/detect/missing",model="missing",stage="t_stage_labelled"' in rendered
+    assert 'endpoint="direct",model="direct",stage="t_stage_direct"' in rendered
+    assert seen == ["t_stage_labelled", "t_stage_direct"]
+
+
+def test_helpers_are_noops_when_disabled():
+    metrics.set_enabled(False)
+    counter = metrics.Counter("t_off_total", "Test.")
+    gauge = metrics.Gauge("t_off", "Test.", ("cache",))
+    histogram = metrics.Histogram("t_off_seconds", "Test.")
+    counter.inc()
+    gauge.set(5, "results")
+    gauge.inc("results")
+    histogram.observe(0.2)
+    with metrics.stage("t_stage_disabled"):
+        pass
+    assert counter.render()[2:] == []
+    assert gauge.get("results") == 0.0
+    assert histogram.render()[2:] == []
+    assert "t_stage_disabled" not in "\n".join(metrics.STAGE_SECONDS.render())
+
+
+@pytest.mark.parametrize("enabled, status", [(True, 200), (False, 404)])
+def test_metrics_endpoint_follows_the_switch(enabled, status):
+    metrics.set_enabled(enabled)
+    app = Flask(__name__)
+    app.register_blueprint(debug_bp)
+    response = app.test_client().get("/debug/metrics")
+    assert response.status_code == status
+    if enabled:
+        assert "# TYPE pcb_detect_stage_seconds histogram" in response.get_data(as_text=True)
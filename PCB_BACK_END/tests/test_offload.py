@@ -0,0 +1,29 @@
+import threading
+import time
+
+from utils.offload import run_blocking
+
+
+def test_runs_inline_without_eventlet_patching():
+    assert run_blocking(lambda a, b=0: a + b, 2, b=3) == 5
+
+
+def test_calls_sharing_a_key_do_not_overlap():
+    active = {"now": 0, "max": 0}
+    guard = threading.Lock()
+
+    def predict():
+        with guard:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.02)
+        with guard:
+            active["now"] -= 1
+
+    threads = [threading.Thread(target=run_blocking, args=(predict,), kwargs={"serialize": "missing"})
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert active["max"] == 1
@@ -0,0 +1,27 @@
+from utils import profiling
+
+
+def test_overlapping_capture_runs_unprofiled():
+    profiling.configure({"PROFILING_ENABLED": True, "PROFILING_MAX_CAPTURES": 5})
+    before = len(profiling.list_captures())
+    with profiling.capture("/detect/missing", "missing") as outer:
+        assert profiling.in_capture()
+        assert not profiling.should_capture({profiling.PROFILE_HEADER: "1"})
+        with profiling.capture("/detect/burnt", "burnt") as inner:
+            inner["status"] = 200
+        outer["status"] = 200
+
+    captures = profiling.list_captures()
+    assert len(captures) == before + 1
+    assert not profiling.in_capture()
+    assert profiling.should_capture({profiling.PROFILE_HEADER: "1"})
+
+
+def test_capture_is_released_after_an_exception():
+    profiling.configure({"PROFILING_ENABLED": True})
+    try:
+        with profiling.capture("/detect/missing", "missing"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert profiling.should_capture({profiling.PROFILE_HEADER: "1"})
@@ -0,0 +1,160 @@
+import base64
+import os
+import sqlite3
+
+import cv2
+import numpy as np
+import pytest
+from flask import Flask
+
+from routes import report_routes
+from utils import report_store
+from utils.report_store import ReportStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ReportStore(str(tmp_path))
+
+
+def test_stores_detections_and_voltage(store):
+    report_id = store.create_report({
+        "board_serial": "SN-1",
+        "missing": {"detections": [{"label": "R1", "confidence": 0.9, "bbox": [1, 2, 3, 4]}]},
+        "voltage": [{"point": "A1", "value": 0.01, "expected": 0.0, "status": "OK"}],
+    })
+    report = store.get_report(report_id)
+    assert report["missing_count"] == 1
+    assert report["detections"]["missing"][0]["bbox"] == [1, 2, 3, 4]
+    assert report["voltage"][0]["point"] == "A1"
+
+
+@pytest.mark.parametrize("payload", [
+    ["not", "an", "object"],
+    {"board_serial": "SN-1", "missing": ["R1"]},
+    {"board_serial": "SN-1", "missing": {"detections": "R1"}},
+    {"board_serial": "SN-1", "missing": {"detections": ["R1"]}},
+    {"board_serial": "SN-1", "burnt": {"detections": [{"bbox": 5}]}},
+    {"board_serial": "SN-1", "burnt": {"detections": [{"bbox": [1, 2, 3]}]}},
+    {"board_serial": "SN-1", "burnt": {"detections": [{"bbox": [1, 2, 3, "x"]}]}},
+    {"board_serial": "SN-1", "burnt": {"detections": [{"bbox": [1, 2, 3, 4], "confidence": "high"}]}},
+    {"board_serial": "SN-1", "voltage": "A1"},
+    {"board_serial": "SN-1", "voltage": ["A1"]},
+    {"board_serial": "SN-1", "voltage": [{"point": "A1", "value": {"v": 1}}]},
+    {"board_serial": {"id": 1}},
+    {"board_serial": "SN-1", "notes": {"a": 1}},
+    {"board_serial": "SN-1", "board_type": ["a"]},
+    {"board_serial": "SN-1", "technician": 42},
+    {"board_serial": "SN-1", "burnt": {"image_base64": base64.b64encode(b"not an image").decode()}},
+])
+def test_rejects_malformed_payload_without_writing(store, payload):
+    with pytest.raises(ValueError):
+        store.create_report(payload)
+    assert store.list_reports()["reports"] == []
+    assert _stored_files(store) == []
+
+
+def _png_base64(width=640, height=480, value=0):
+    ok, buffer = cv2.imencode(".png", np.full((height, width, 3), value, dtype=np.uint8))
+    assert ok
+    return base64.b64encode(buffer.tobytes()).decode()
+
+
+def _stored_files(store):
+    return [name for tier in (store.full_dir, store.thumb_dir) for _, _, files in os.walk(tier) for name in files]
+
+
+def test_failed_insert_leaves_no_image_files(store, monkeypatch):
+    monkeypatch.setattr(report_store, "_utc_now", lambda: None)  # violates created_at NOT NULL
+    with pytest.raises(sqlite3.IntegrityError):
+        store.create_report({"board_serial": "SN-1", "missing": {"image_base64": _png_base64()}})
+    assert _stored_files(store) == []
+
+
+@pytest.mark.parametrize("body", [
+    [1, 2],
+    {"board_serial": "SN-1", "missing": {"detections": [{"bbox": 5}]}},
+    {"board_serial": "SN-1", "voltage": [3.3]},
+    {"board_serial": "SN-1", "notes": {"a": 1}},
+])
+def test_route_returns_400_for_malformed_payload(tmp_path, monkeypatch, body):
+    monkeypatch.setattr(report_routes, "model_versions", lambda: {})
+    app = Flask(__name__)
+    app.extensions["report_store"] = ReportStore(str(tmp_path))
+    app.register_blueprint(report_routes.report_bp)
+
+    response = app.test_client().post("/reports", json=body)
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+def test_list_filters_by_serial_type_label_and_date(store, monkeypatch):
+    for created_at, serial, board_type, label in [
+        ("2026-01-01T00:00:00Z", "SN-1", "ECU", "R1"),
+        ("2026-02-01T00:00:00Z", "SN-2", "ECU", "C4"),
+        ("2026-03-01T00:00:00Z", "SN-1", "BMS", "C4"),
+    ]:
+        monkeypatch.setattr(report_store, "_utc_now", lambda value=created_at: value)
+        store.create_report({
+            "board_serial": serial,
+            "board_type": board_type,
+            "missing": {"detections": [{"label": label, "confidence": 0.9, "bbox": [1, 2, 3, 4]}]},
+        })
+
+    def serials(**filters):
+        return [(r["board_serial"], r["created_at"][:7]) for r in store.list_reports(**filters)["reports"]]
+
+    assert serials(board_serial="SN-1") == [("SN-1", "2026-03"), ("SN-1", "2026-01")]
+    assert serials(board_type="ECU") == [("SN-2", "2026-02"), ("SN-1", "2026-01")]
+    assert serials(label="C4") == [("SN-1", "2026-03"), ("SN-2", "2026-02")]
+    assert serials(since="2026-02-01", until="2026-03-01") == [("SN-2", "2026-02")]
+    assert serials(board_serial="SN-1", label="C4") == [("SN-1", "2026-03")]
+
+
+def test_next_cursor_pages_through_every_report_once(store):
+    created = [store.create_report({"board_serial": f"SN-{i}"}) for i in range(25)]
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = store.list_reports(cursor=cursor, limit=10)
+        seen += [r["id"] for r in page["reports"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == 3
+    assert seen == sorted(created, reverse=True)
+
+
+def test_identical_images_are_stored_once_with_a_small_thumbnail(store):
+    image = _png_base64(width=1600, height=1200, value=128)
+    first = store.create_report({"board_serial": "SN-1", "missing": {"image_base64": image}})
+    second = store.create_report({"board_serial": "SN-2", "burnt": {"image_base64": image}})
+
+    image_hash = store.get_report(first)["images"]["missing"]["hash"]
+    assert store.get_report(second)["images"]["burnt"]["hash"] == image_hash
+    assert len(_stored_files(store)) == 2  # one full, one thumb
+    with sqlite3.connect(store.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM images").fetchone()[0] == 1
+
+    thumb = cv2.imread(store.image_path(image_hash, "thumb"))
+    assert max(thumb.shape[:2]) <= report_store.THUMB_MAX_SIDE
+
+
+@pytest.fixture
+def image_client(tmp_path):
+    app = Flask(__name__)
+    app.extensions["report_store"] = ReportStore(str(tmp_path))
+    app.register_blueprint(report_routes.report_bp)
+    return app.test_client()
+
+
+def test_report_image_route_validates_tier_and_hash(image_client):
+    store = image_client.application.extensions["report_store"]
+    report_id = store.create_report({"board_serial": "SN-1", "missing": {"image_base64": _png_base64()}})
+    image_hash = store.get_report(report_id)["images"]["missing"]["hash"]
+
+    assert image_client.get(f"/reports/images/{image_hash}?tier=full").status_code == 200
+    assert image_client.get(f"/reports/images/{image_hash}?tier=huge").status_code == 400
+    assert image_client.get("/reports/images/not-a-hash").status_code == 400
+    assert image_client.get(f"/reports/images/{image_hash.upper()}").status_code == 400
+    assert image_client.get(f"/reports/images/{'0' * 64}").status_code == 404
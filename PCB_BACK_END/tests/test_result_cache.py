@@ -0,0 +1,54 @@
+import numpy as np
+
+from model.boxes import empty_boxes
+from utils.result_cache import ResultCache, SessionImageCache, cache_budgets
+
+MB = 1024 * 1024
+
+
+def _image(mb=1):
+    return np.zeros((mb * MB,), dtype=np.uint8)
+
+
+def test_clear_drops_everything_and_reports_bytes_freed():
+    cache = SessionImageCache(max_bytes=8 * MB, ttl_seconds=60)
+    cache.put("a", "missing", _image())
+    cache.put("b", "burnt", _image())
+    assert cache.clear() == 2 * MB
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_evicts_least_recently_used_over_budget():
+    cache = ResultCache(max_bytes=2 * MB, ttl_seconds=60)
+    first = cache.put("missing", (empty_boxes(), {}), _image())
+    second = cache.put("missing", (empty_boxes(), {}), _image())
+    assert cache.get(first) is not None
+    cache.put("missing", (empty_boxes(), {}), _image())
+    assert cache.get(first) is not None
+    assert cache.get(second) is None
+
+
+def test_budgets_are_unchanged_without_a_ceiling():
+    config = {"RESULT_CACHE_MAX_MB": 128, "SESSION_IMAGE_CACHE_MAX_MB": 256, "ADMISSION_MAX_RSS_MB": 0}
+    assert cache_budgets(config) == (128 * MB, 256 * MB)
+
+
+def test_budgets_fit_a_share_of_the_rss_ceiling():
+    config = {
+        "RESULT_CACHE_MAX_MB": 128,
+        "SESSION_IMAGE_CACHE_MAX_MB": 256,
+        "ADMISSION_MAX_RSS_MB": 1024,
+        "CACHE_RSS_SHARE": 0.25,
+    }
+    result_bytes, image_bytes = cache_budgets(config)
+    assert result_bytes + image_bytes <= 256 * MB
+    assert image_bytes == 2 * result_bytes
+
+
+def test_oversized_put_drops_the_previous_entry_for_that_key():
+    cache = SessionImageCache(max_bytes=1000, ttl_seconds=60)
+    assert cache.put("s", "missing", np.zeros((500,), dtype=np.uint8))
+    assert not cache.put("s", "missing", np.zeros((2000,), dtype=np.uint8))
+    assert cache.get("s") is None
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,35 @@
+import pytest
+
+from model.config import ROI_MIN_SIDE
+from model.roi import clamp_region
+
+
+def test_clamps_and_orders_pixel_regions():
+    assert clamp_region([900, -10, 100, 300], 800, 600) == (100, 0, 800, 300)
+
+
+def test_scales_normalized_regions():
+    assert clamp_region([0.25, 0.5, 0.75, 1.0], 800, 600, normalized=True) == (200, 300, 600, 600)
+
+
+@pytest.mark.parametrize("roi", [
+    5,
+    "0,0,100,100",
+    {"x1": 0},
+    None,
+    [0, 0, 100],
+    [0, 0, 100, "x"],
+    [0, 0, 100, None],
+    [float("nan"), 0, 100, 100],
+    [0, 0, float("inf"), 100],
+])
+def test_rejects_malformed_regions(roi):
+    with pytest.raises(ValueError):
+        clamp_region(roi, 800, 600)
+
+
+def test_rejects_regions_too_small_inside_the_image():
+    with pytest.raises(ValueError):
+        clamp_region([790, 0, 900, 100], 800, 600)
+    with pytest.raises(ValueError):
+        clamp_region([0, 0, ROI_MIN_SIDE - 1, 100], 800, 600)
@@ -0,0 +1,57 @@
+import pytest
+
+from model import runtime
+
+TUNING = {
+    "workers": 4,
+    "interop_threads": 1,
+    "opencv_threads": 1,
+    "by_workers": {
+        "1": {"torch_threads": 8, "pin_cpus": False, "cpu_sets": [[0, 1, 2, 3, 4, 5, 6, 7]], "score": 20.0},
+        "4": {"torch_threads": 2, "pin_cpus": True, "cpu_sets": [[0, 1], [2, 3], [4, 5], [6, 7]], "score": 30.0},
+    },
+}
+
+
+@pytest.fixture
+def applied(monkeypatch):
+    calls = []
+    monkeypatch.setattr(runtime, "load_tuning", lambda: TUNING)
+    monkeypatch.setattr(runtime, "apply_thread_limits", lambda **kwargs: calls.append(kwargs))
+    monkeypatch.delenv("PCB_TORCH_THREADS", raising=False)
+    monkeypatch.delenv("PCB_WORKER_COUNT", raising=False)
+    monkeypatch.delenv("PCB_WORKER_INDEX", raising=False)
+    return calls
+
+
+def test_selects_the_entry_for_the_running_worker_count():
+    entry = runtime.tuning_for_workers(TUNING, 4)
+    assert entry["torch_threads"] == 2
+    assert runtime.worker_cpus(entry, 2) == [4, 5]
+    assert runtime.worker_cpus(runtime.tuning_for_workers(TUNING, 1), 0) is None
+    assert runtime.tuning_for_workers(TUNING, 2) is None
+
+
+def test_single_worker_gets_the_single_worker_config(applied):
+    runtime.apply_runtime_tuning()
+    assert applied == [{"torch_threads": 8, "interop_threads": 1, "opencv_threads": 1, "cpus": None}]
+
+
+def test_worker_count_and_index_come_from_gunicorn(applied, monkeypatch):
+    monkeypatch.setenv("PCB_WORKER_COUNT", "4")
+    monkeypatch.setenv("PCB_WORKER_INDEX", "3")
+    runtime.apply_runtime_tuning()
+    assert applied[0]["torch_threads"] == 2
+    assert applied[0]["cpus"] == [6, 7]
+
+
+def test_unmeasured_worker_count_applies_nothing(applied):
+    assert runtime.apply_runtime_tuning(workers=3) is None
+    assert applied == []
+
+
+def test_thread_override_applies_without_a_matching_entry(applied, monkeypatch):
+    monkeypatch.setenv("PCB_TORCH_THREADS", "3")
+    runtime.apply_runtime_tuning(workers=3)
+    assert applied[0]["torch_threads"] == 3
+    assert applied[0]["cpus"] is None
@@ -0,0 +1,164 @@
+"""
+Admission control for the /detect endpoints.
+
+Image detection runs in a "detection" lane with a bounded number of
+concurrent requests and a bounded wait queue. Requests are rejected
+up-front with 429 + Retry-After when the queue is full, when they waited
+longer than the queue timeout, or when the worker's RSS is above the
+configured ceiling. Rejecting early means the request body is never decoded.
+Before a memory rejection the on_memory_pressure hook (the app sheds its
+result/image caches) gets one chance to bring RSS back under the ceiling.
+
+Voltage ingest and bench control are deliberately not admission-controlled:
+the ESP32 firmware treats any non-200 answer as "CONTINUE" and would skip
+the point. They stay responsive because model inference runs on a native
+thread (utils.offload), leaving the eventlet hub free to serve them.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Iterator, Optional
+
+from utils import metrics
+from utils.response import error_response
+
+DETECTION_LANE = "detection"
+
+ADMISSION_REJECTED = metrics.Counter(
+    "pcb_admission_rejected_total",
+    "Requests rejected by admission control.",
+    ("lane", "reason"),
+)
+metrics.REGISTRY.append(ADMISSION_REJECTED)
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int = 1,
+        max_queue: int = 4,
+        queue_timeout: float = 30.0,
+        max_rss_bytes: Optional[float] = None,
+        rss_reader: Callable[[], float] = metrics.current_rss_bytes,
+        on_memory_pressure: Optional[Callable[[], None]] = None,
+    ):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = float(queue_timeout)
+        self.max_rss_bytes = max_rss_bytes
+        self._rss_reader = rss_reader
+        self._on_memory_pressure = on_memory_pressure
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        # Exponentially weighted detection service time, used for Retry-After.
+        self._service_ewma = 1.0
+
+    # -- state -------------------------------------------------------------
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "active": self._active,
+                "waiting": self._waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "max_rss_bytes": self.max_rss_bytes,
+                "service_time_ewma_s": round(self._service_ewma, 3),
+            }
+
+    def _retry_after(self) -> int:
+        backlog = self._active + self._waiting + 1
+        return max(1, math.ceil(backlog * self._service_ewma / self.max_concurrent))
+
+    def _over_memory(self) -> bool:
+        if not self.max_rss_bytes or self._rss_reader() <= self.max_rss_bytes:
+            return False
+        if self._on_memory_pressure is None:
+            return True
+        self._on_memory_pressure()
+        return self._rss_reader() > self.max_rss_bytes
+
+    # -- slots -------------------------------------------------------------
+    @contextmanager
+    def detection_slot(self) -> Iterator[None]:
+        with self._cond:
+            if self._over_memory():
+                raise Overloaded("memory", self._retry_after())
+            if self._active >= self.max_concurrent:
+                if self._waiting >= self.max_queue:
+                    raise Overloaded("queue_full", self._retry_after())
+                self._waiting += 1
+                metrics.QUEUE_DEPTH.inc()
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while self._active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise Overloaded("queue_timeout", self._retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    metrics.QUEUE_DEPTH.dec()
+                # Memory may have grown while this request was waiting.
+                if self._over_memory():
+                    self._cond.notify()
+                    raise Overloaded("memory", self._retry_after())
+            self._active += 1
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._cond:
+                self._active -= 1
+                self._service_ewma = 0.8 * self._service_ewma + 0.2 * elapsed
+                self._cond.notify()
+
+
+controller = AdmissionController()
+
+
+def configure(config, on_memory_pressure: Optional[Callable[[], None]] = None) -> None:
+    """(Re)build the module controller from Flask app config."""
+    global controller
+    max_rss_mb = config.get("ADMISSION_MAX_RSS_MB") or 0
+    controller = AdmissionController(
+        max_concurrent=config.get("ADMISSION_MAX_CONCURRENT", 1),
+        max_queue=config.get("ADMISSION_MAX_QUEUE", 4),
+        queue_timeout=config.get("ADMISSION_QUEUE_TIMEOUT", 30.0),
+        max_rss_bytes=float(max_rss_mb) * 1024 * 1024 if float(max_rss_mb) > 0 else None,
+        on_memory_pressure=on_memory_pressure,
+    )
+
+
+def admitted(lane: str) -> Callable:
+    """Route decorator: run the view inside an admission slot, 429 when overloaded."""
+
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with controller.detection_slot():
+                    return view(*args, **kwargs)
+            except Overloaded as exc:
+                ADMISSION_REJECTED.inc(lane, exc.reason)
+                response, status = error_response(
+                    "Server is busy, please retry shortly.", status_code=429, reason=exc.reason,
+                    retry_after=exc.retry_after,
+                )
+                response.headers["Retry-After"] = str(exc.retry_after)
+                return response, status
+
+        return wrapper
+
+    return decorator
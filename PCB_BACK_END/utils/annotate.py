@@ -4,6 +4,8 @@ from typing import Dict, List, Union
 import cv2
 import numpy as np
 
+from utils import metrics
+
 
 COLORS = [
     (255, 0, 0),
@@ -37,14 +39,16 @@ def annotate_image(image_input: ImageInput, detections: List[Dict]) -> str:
     # with label placement in some scenarios.
     detections.sort(key=lambda d: d["bbox"][1])
 
-    for index, detection in enumerate(detections):
-        _draw_detection(image, detection, index)
+    with metrics.stage("annotate"):
+        for index, detection in enumerate(detections):
+            _draw_detection(image, detection, index)
 
-    success, buffer = cv2.imencode(".jpg", image)
-    if not success:
-        raise RuntimeError("Failed to encode annotated image to JPEG format.")
+    with metrics.stage("jpeg_encode"):
+        success, buffer = cv2.imencode(".jpg", image)
+        if not success:
+            raise RuntimeError("Failed to encode annotated image to JPEG format.")
 
-    base64_bytes = base64.b64encode(buffer.tobytes())
+        base64_bytes = base64.b64encode(buffer.tobytes())
     return base64_bytes.decode("utf-8")
 
 
@@ -0,0 +1,108 @@
+"""
+Static asset serving on top of the build output of build_assets.py.
+
+- url_for('static', filename=...) is rewritten to the fingerprinted file
+  from static/dist/manifest.json when a build exists (falls back to the
+  original file otherwise, so development works without a build)
+- fingerprinted files are served with a one-year immutable Cache-Control
+- precompressed .br/.gz siblings are served when the client accepts them
+- ETag/If-None-Match (304) and HTTP Range (206) for the .webm/.mp4
+  backgrounds come from Werkzeug's conditional send_file
+"""
+import json
+import mimetypes
+import os
+from typing import Dict, Optional
+
+from flask import Flask, current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+DIST_PREFIX = "dist/"
+MANIFEST_PATH = os.path.join("dist", "manifest.json")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Python 3.10's table lacks some of the formats the build emits.
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("video/webm", ".webm")
+
+
+def init_assets(app: Flask) -> None:
+    manifest = _load_manifest(app)
+    # filename -> available precompressed suffixes, filled lazily on first request.
+    # Only files that exist are cached, so the dict is bounded by what is on disk.
+    variants: Dict[str, tuple] = {}
+    app.extensions["pcb_assets"] = manifest
+    app.extensions["pcb_asset_variants"] = variants
+
+    @app.url_defaults
+    def fingerprinted_static(endpoint, values):
+        if endpoint == "static" and manifest:
+            built = manifest.get(values.get("filename"))
+            if built:
+                values["filename"] = built
+
+    def serve_static(filename: str):
+        static_folder = current_app.static_folder
+        immutable = filename.startswith(DIST_PREFIX)
+        max_age = IMMUTABLE_MAX_AGE if immutable else current_app.get_send_file_max_age(filename)
+
+        available = variants.get(filename)
+        if available is None:
+            path = safe_join(static_folder, filename)
+            if path is None or not os.path.isfile(path):
+                return send_from_directory(static_folder, filename, max_age=max_age)  # 404
+            available = variants[filename] = _precompressed_variants(static_folder, filename)
+
+        encoding = _negotiate(available)
+        if encoding is not None:
+            name, suffix = encoding
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            response = send_from_directory(static_folder, filename + suffix, mimetype=mimetype, max_age=max_age)
+            response.headers["Content-Encoding"] = name
+        else:
+            response = send_from_directory(static_folder, filename, max_age=max_age)
+
+        if available:
+            response.vary.add("Accept-Encoding")
+        if immutable:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        return response
+
+    app.view_functions["static"] = serve_static
+
+
+def _load_manifest(app: Flask) -> Dict[str, str]:
+    path = os.path.join(app.static_folder, MANIFEST_PATH)
+    if not os.path.isfile(path):
+        app.logger.info("No static asset manifest at %s; serving unbuilt assets.", path)
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError) as exc:
+        app.logger.warning("Ignoring unreadable asset manifest %s: %s", path, exc)
+        return {}
+    app.logger.info("Loaded %d fingerprinted static assets.", len(manifest))
+    return manifest
+
+
+def _precompressed_variants(static_folder: str, filename: str) -> tuple:
+    found = []
+    for name, suffix in ENCODINGS:
+        path = safe_join(static_folder, filename + suffix)
+        if path is not None and os.path.isfile(path):
+            found.append((name, suffix))
+    return tuple(found)
+
+
+def _negotiate(available: tuple) -> Optional[tuple]:
+    # Range requests must address the identity representation.
+    if not available or "Range" in request.headers:
+        return None
+    accepted = request.accept_encodings
+    for name, suffix in available:
+        if accepted[name]:
+            return name, suffix
+    return None
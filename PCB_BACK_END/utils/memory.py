@@ -0,0 +1,62 @@
+"""
+Per-process memory accounting (Linux /proc).
+
+RSS counts shared pages in full in every worker, so it can't show what a
+worker really costs. PSS splits shared pages evenly between the processes
+mapping them. USS (private clean + private dirty) is what the kernel would
+free if the worker exited. With preloaded models, a worker's USS should
+stay around the size of its activations.
+"""
+import os
+from typing import Dict, List, Optional, Union
+
+_FIELDS = {
+    "Rss": "rss_bytes",
+    "Pss": "pss_bytes",
+    "Shared_Clean": "shared_clean_bytes",
+    "Shared_Dirty": "shared_dirty_bytes",
+    "Private_Clean": "private_clean_bytes",
+    "Private_Dirty": "private_dirty_bytes",
+    "Swap": "swap_bytes",
+}
+
+
+def process_memory(pid: Union[int, str] = "self") -> Optional[Dict[str, int]]:
+    """RSS/PSS/USS of a process from /proc/<pid>/smaps_rollup, or None when unavailable."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r", encoding="ascii") as handle:
+            lines = handle.readlines()
+    except OSError:
+        return None
+
+    memory: Dict[str, int] = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") in _FIELDS:
+            memory[_FIELDS[parts[0].rstrip(":")]] = int(parts[1]) * 1024
+    memory["uss_bytes"] = memory.get("private_clean_bytes", 0) + memory.get("private_dirty_bytes", 0)
+    return memory
+
+
+def sibling_worker_pids() -> List[int]:
+    """PIDs of all children of this process's parent (the gunicorn workers), including this one."""
+    parent = os.getppid()
+    try:
+        with open(f"/proc/{parent}/task/{parent}/children", "r", encoding="ascii") as handle:
+            return sorted(int(pid) for pid in handle.read().split())
+    except OSError:
+        return [os.getpid()]
+
+
+def workers_report() -> Dict:
+    workers = []
+    for pid in sibling_worker_pids():
+        memory = process_memory(pid)
+        if memory is not None:
+            workers.append({"pid": pid, "self": pid == os.getpid(), **memory})
+    return {
+        "master_pid": os.getppid(),
+        "master": process_memory(os.getppid()),
+        "workers": workers,
+        "total_pss_bytes": sum(w.get("pss_bytes", 0) for w in workers),
+    }
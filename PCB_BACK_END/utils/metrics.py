@@ -0,0 +1,333 @@
+"""
+In-process metrics for the detection and voltage hot paths.
+
+Metrics are kept in plain Python structures and rendered in the Prometheus
+text exposition format on demand by ``/debug/metrics``. Recording a sample is
+a dict lookup plus a few additions under a lock, and nothing is formatted
+until a scrape happens. When metrics are disabled every helper below turns
+into a no-op.
+"""
+import os
+import resource
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from utils.memory import process_memory
+
+LabelValues = Tuple[str, ...]
+
+# Seconds. Covers sub-millisecond decode steps up to multi-second CPU inference.
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+VOLTAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+_enabled = True
+
+# Labels of the detection request currently being handled (endpoint, model).
+# Greenlets and threads each see their own value.
+_request_labels: ContextVar[Optional[LabelValues]] = ContextVar("pcb_request_labels", default=None)
+# Per-request (stage, seconds) list, set while a profiling capture is running.
+_stage_sink: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("pcb_stage_sink", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not _enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, *labels: str) -> None:
+        if not _enabled:
+            return
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not _enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def get(self, *labels: str) -> float:
+        if self._callback is not None:
+            return float(self._callback())
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        if self._callback is not None:
+            lines.append(f"{self.name} {_format_value(self.get())}")
+            return lines
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = STAGE_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not _enabled:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = self._header()
+        for labels, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {_format_value(cumulative)}"
+                )
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_str} {_format_value(cumulative)}")
+        return lines
+
+
+def current_rss_bytes() -> float:
+    """Resident set size of this process, in bytes."""
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return float(resident_pages * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, IndexError):
+        # Non-Linux fallback: peak RSS (kilobytes on Linux/BSD, bytes on macOS).
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return float(peak if os.uname().sysname == "Darwin" else peak * 1024)
+
+
+# -------------------------------------------------------------------------
+# Registry
+# -------------------------------------------------------------------------
+STAGE_SECONDS = Histogram(
+    "pcb_detect_stage_seconds",
+    "Time spent in each stage of a detection request.",
+    ("endpoint", "model", "stage"),
+)
+REQUEST_SECONDS = Histogram(
+    "pcb_detect_request_seconds",
+    "End-to-end time of a detection request.",
+    ("endpoint", "model", "status"),
+)
+IN_FLIGHT = Gauge(
+    "pcb_detect_in_flight",
+    "Detection requests currently being processed.",
+)
+QUEUE_DEPTH = Gauge(
+    "pcb_detect_queue_depth",
+    "Detection requests waiting in the admission queue.",
+)
+PROCESS_RSS = Gauge(
+    "pcb_process_resident_memory_bytes",
+    "Resident set size of the worker process.",
+    callback=current_rss_bytes,
+)
+PROCESS_PSS = Gauge(
+    "pcb_process_proportional_memory_bytes",
+    "Proportional set size (shared pages split between workers) of the worker process.",
+    callback=lambda: (process_memory() or {}).get("pss_bytes", 0),
+)
+PROCESS_USS = Gauge(
+    "pcb_process_unique_memory_bytes",
+    "Unique set size (private pages only) of the worker process.",
+    callback=lambda: (process_memory() or {}).get("uss_bytes", 0),
+)
+VOLTAGE_INGEST_TOTAL = Counter(
+    "pcb_voltage_ingest_total",
+    "Voltage readings received from bench devices.",
+    ("status",),
+)
+VOLTAGE_INGEST_SECONDS = Histogram(
+    "pcb_voltage_ingest_seconds",
+    "Time to handle one /detect/esp_voltage reading, including the Socket.IO emit.",
+    buckets=VOLTAGE_BUCKETS,
+)
+
+REGISTRY: List[_Metric] = [
+    STAGE_SECONDS,
+    REQUEST_SECONDS,
+    IN_FLIGHT,
+    QUEUE_DEPTH,
+    PROCESS_RSS,
+    PROCESS_PSS,
+    PROCESS_USS,
+    VOLTAGE_INGEST_TOTAL,
+    VOLTAGE_INGEST_SECONDS,
+]
+
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------------------------------------------------
+# Hot-path helpers
+# -------------------------------------------------------------------------
+@contextmanager
+def request_labels(endpoint: str, model: str) -> Iterator[None]:
+    """Attach endpoint/model labels to every stage timed inside the block."""
+    token = _request_labels.set((endpoint, model))
+    try:
+        yield
+    finally:
+        _request_labels.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a pipeline stage of the current detection request.
+    Outside of ``request_labels`` (e.g. scripts calling the detectors
+    directly) the stage is still timed under endpoint/model "direct".
+    """
+    sink = _stage_sink.get()
+    if not _enabled and sink is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        labels = _request_labels.get() or ("direct", "direct")
+        STAGE_SECONDS.observe(elapsed, labels[0], labels[1], name)
+        if sink is not None:
+            sink.append((name, elapsed))
+        for listener in _stage_listeners:
+            listener(name, elapsed)
+
+
+@contextmanager
+def collect_stages() -> Iterator[List[Tuple[str, float]]]:
+    """Collect the stages timed in the current context only (used by profiling captures)."""
+    sink: List[Tuple[str, float]] = []
+    token = _stage_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _stage_sink.reset(token)
+
+
+# Extra consumers of stage timings (e.g. benchmarks). Kept as a plain list so
+# the common case of no listeners costs a single empty loop.
+_stage_listeners: List[Callable[[str, float], None]] = []
+
+
+def add_stage_listener(listener: Callable[[str, float], None]) -> None:
+    _stage_listeners.append(listener)
+
+
+def remove_stage_listener(listener: Callable[[str, float], None]) -> None:
+    if listener in _stage_listeners:
+        _stage_listeners.remove(listener)
@@ -0,0 +1,57 @@
+"""
+Run CPU-bound inference off the eventlet hub.
+
+Under gunicorn's eventlet worker every request shares one OS thread, so a
+model.predict call would block the hub for its whole duration: voltage
+ingest, Socket.IO emits, queued admission waiters and even fast 429s all
+stall behind it. run_blocking hands the call to eventlet's native thread
+pool (torch releases the GIL while it computes) and parks only the calling
+greenlet.
+
+Calls that share a `serialize` key run one at a time, because an ultralytics
+model is not safe to call from several threads at once. The lock is a native
+one (eventlet's green locks must not be taken from pool threads).
+
+Without eventlet (flask dev server, benchmarks, autotune) the call runs
+inline in the caller's thread, and so does the request being profiled
+(cProfile only sees the thread it was enabled in).
+"""
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from utils import profiling
+
+try:
+    from eventlet import patcher, tpool
+except ImportError:  # eventlet is only installed for the gunicorn deployment
+    patcher = tpool = None
+
+_native_threading = patcher.original("threading") if patcher is not None else threading
+_locks: Dict[str, Any] = {}
+_locks_guard = _native_threading.Lock()
+
+
+def _lock_for(key: str):
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = _native_threading.Lock()
+        return lock
+
+
+def hub_is_patched() -> bool:
+    return patcher is not None and patcher.is_monkey_patched("thread")
+
+
+def run_blocking(fn: Callable, *args, serialize: Optional[str] = None, **kwargs):
+    """Call fn(*args, **kwargs) on a native thread when running under eventlet."""
+
+    def call():
+        if serialize is None:
+            return fn(*args, **kwargs)
+        with _lock_for(serialize):
+            return fn(*args, **kwargs)
+
+    if not hub_is_patched() or profiling.in_capture():
+        return call()
+    return tpool.execute(call)
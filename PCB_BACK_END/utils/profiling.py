@@ -0,0 +1,158 @@
+"""
+Opt-in cProfile capture of detection requests.
+
+When enabled, a configurable fraction of detection requests (plus any
+request sent with the ``X-PCB-Profile: 1`` header) runs under cProfile.
+The profile, the per-stage timings and the input image dimensions are kept
+in a bounded ring buffer and served by ``/debug/profiles``. When profiling is
+disabled, the only cost per request is the ``should_capture`` check.
+
+Only one capture runs at a time: cProfile hooks are per interpreter on
+Python 3.12+ (a second ``enable()`` raises) and per thread before that (a
+second profiler in the same eventlet thread silently takes over). Requests
+arriving while a capture is running are simply not sampled.
+"""
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from utils import metrics
+
+PROFILE_HEADER = "X-PCB-Profile"
+
+_enabled = False
+_sample_rate = 0.0
+_captures: deque = deque(maxlen=20)
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_current: ContextVar[Optional[Dict]] = ContextVar("pcb_profile_capture", default=None)
+_active = False
+
+
+def configure(config) -> None:
+    global _enabled, _sample_rate, _captures
+    _enabled = bool(config.get("PROFILING_ENABLED", False))
+    _sample_rate = min(1.0, max(0.0, float(config.get("PROFILING_SAMPLE_RATE", 0.0))))
+    with _lock:
+        _captures = deque(_captures, maxlen=max(1, int(config.get("PROFILING_MAX_CAPTURES", 20))))
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def should_capture(headers) -> bool:
+    if not _enabled or _active:
+        return False
+    if headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return _sample_rate > 0 and random.random() < _sample_rate
+
+
+def in_capture() -> bool:
+    """True inside the request currently being profiled (utils.offload then runs inference inline)."""
+    return _current.get() is not None
+
+
+@contextmanager
+def capture(endpoint: str, model: str) -> Iterator[Dict]:
+    """
+    Profile the enclosed block and store the result in the ring buffer. If
+    another capture is already running, the block runs unprofiled and the
+    yielded record is discarded.
+    """
+    global _active
+    with _lock:
+        claimed = not _active
+        _active = True
+    if not claimed:
+        yield {}
+        return
+
+    record: Dict = {
+        "id": next(_ids),
+        "endpoint": endpoint,
+        "model": model,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "status": None,
+        "input_shape": None,
+    }
+    profiler = cProfile.Profile()
+    token = _current.set(record)
+    start = time.perf_counter()
+    try:
+        with metrics.collect_stages() as stages:
+            profiler.enable()
+            try:
+                yield record
+            finally:
+                profiler.disable()
+                _current.reset(token)
+                record["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+                stages_ms: Dict[str, float] = {}
+                for name, elapsed in stages:
+                    stages_ms[name] = round(stages_ms.get(name, 0.0) + elapsed * 1000, 3)
+                record["stages_ms"] = stages_ms
+                profiler.create_stats()
+                record["_stats"] = marshal.dumps(profiler.stats)
+                with _lock:
+                    _captures.append(record)
+    finally:
+        with _lock:
+            _active = False
+
+
+def note(**fields) -> None:
+    """Attach extra fields (e.g. input_shape) to the capture running in this context, if any."""
+    record = _current.get()
+    if record is not None:
+        record.update(fields)
+
+
+def list_captures() -> List[Dict]:
+    with _lock:
+        captures = list(_captures)
+    return [summary(record) for record in reversed(captures)]
+
+
+def get_capture(capture_id: int) -> Optional[Dict]:
+    with _lock:
+        for record in _captures:
+            if record["id"] == capture_id:
+                return record
+    return None
+
+
+def raw_stats(record: Dict) -> bytes:
+    """Marshalled stats in the format written by cProfile (loadable with pstats / snakeviz)."""
+    return record["_stats"]
+
+
+def top_functions(record: Dict, limit: int = 40, sort: str = "cumulative") -> str:
+    stats = pstats.Stats(_StatsSource(marshal.loads(record["_stats"])), stream=io.StringIO())
+    stats.sort_stats(sort).print_stats(limit)
+    return stats.stream.getvalue()
+
+
+def summary(record: Dict) -> Dict:
+    """Capture metadata without the raw profiler stats."""
+    return {key: value for key, value in record.items() if not key.startswith("_")}
+
+
+class _StatsSource:
+    """Adapter so pstats.Stats can load an in-memory stats dict."""
+
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
@@ -0,0 +1,369 @@
+"""
+Diagnosis report store.
+
+Reports (missing/burnt detections, voltage sweep results and the model
+versions that produced them) live in SQLite in WAL mode, indexed by board
+serial, board type, date and fault label. Listing queries read only the
+reports table, which carries denormalized counts and a thumbnail hash.
+
+Images are content-addressed by SHA-256 and deduplicated on disk in two
+tiers: the full-resolution upload under full/ and a small JPEG thumbnail
+under thumbs/. List pages only ever reference thumbnails.
+"""
+import base64
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+
+import cv2
+import numpy as np
+
+THUMB_MAX_SIDE = 320
+THUMB_JPEG_QUALITY = 80
+IMAGE_KINDS = ("missing", "burnt")
+MAX_PAGE_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id               INTEGER PRIMARY KEY AUTOINCREMENT,
+    board_serial     TEXT NOT NULL,
+    board_type       TEXT,
+    created_at       TEXT NOT NULL,
+    technician       TEXT,
+    notes            TEXT,
+    model_versions   TEXT,
+    missing_count    INTEGER NOT NULL DEFAULT 0,
+    burnt_count      INTEGER NOT NULL DEFAULT 0,
+    voltage_failures INTEGER NOT NULL DEFAULT 0,
+    thumb_hash       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reports_serial  ON reports(board_serial, id);
+CREATE INDEX IF NOT EXISTS idx_reports_type    ON reports(board_type, id);
+CREATE INDEX IF NOT EXISTS idx_reports_created ON reports(created_at);
+
+CREATE TABLE IF NOT EXISTS detections (
+    report_id  INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    kind       TEXT NOT NULL,
+    label      TEXT NOT NULL,
+    confidence REAL,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_detections_label  ON detections(label, report_id);
+CREATE INDEX IF NOT EXISTS idx_detections_report ON detections(report_id);
+
+CREATE TABLE IF NOT EXISTS voltage_results (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    point     TEXT NOT NULL,
+    value     REAL,
+    expected  REAL,
+    status    TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_voltage_report ON voltage_results(report_id);
+
+CREATE TABLE IF NOT EXISTS images (
+    hash       TEXT PRIMARY KEY,
+    width      INTEGER,
+    height     INTEGER,
+    size_bytes INTEGER,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS report_images (
+    report_id  INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    kind       TEXT NOT NULL,
+    image_hash TEXT NOT NULL REFERENCES images(hash),
+    PRIMARY KEY (report_id, kind)
+);
+"""
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class ReportStore:
+    def __init__(self, root: str):
+        self.root = root
+        self.db_path = os.path.join(root, "reports.db")
+        self.full_dir = os.path.join(root, "full")
+        self.thumb_dir = os.path.join(root, "thumbs")
+        os.makedirs(self.full_dir, exist_ok=True)
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Short-lived connections: cheap for SQLite and safe under eventlet greenlets.
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # -- images ------------------------------------------------------------
+    def image_path(self, image_hash: str, tier: str = "thumb") -> str:
+        base = self.thumb_dir if tier == "thumb" else self.full_dir
+        suffix = ".jpg" if tier == "thumb" else ".img"
+        return os.path.join(base, image_hash[:2], image_hash + suffix)
+
+    def _insert_image(self, conn: sqlite3.Connection, image: "_PreparedImage") -> None:
+        conn.execute(
+            "INSERT OR IGNORE INTO images (hash, width, height, size_bytes, created_at) VALUES (?, ?, ?, ?, ?)",
+            (image.hash, image.width, image.height, len(image.data), _utc_now()),
+        )
+
+    def _write_image_files(self, image: "_PreparedImage") -> None:
+        # Content-addressed: files already on disk (same bytes) are left as they are.
+        _atomic_write(self.image_path(image.hash, "full"), image.data)
+        _atomic_write(self.image_path(image.hash, "thumb"), image.thumb)
+
+    # -- writes ------------------------------------------------------------
+    def create_report(self, payload: Dict, model_versions: Optional[Dict] = None) -> int:
+        """Validate and store a report; malformed payloads raise ValueError before anything is written."""
+        if not isinstance(payload, dict):
+            raise ValueError("Report body must be a JSON object.")
+        serial = _optional_text(payload.get("board_serial"), "'board_serial'") or ""
+        if not serial.strip():
+            raise ValueError("'board_serial' is required.")
+        serial = serial.strip()
+        board_type = _optional_text(payload.get("board_type"), "'board_type'")
+        technician = _optional_text(payload.get("technician"), "'technician'")
+        notes = _optional_text(payload.get("notes"), "'notes'")
+
+        detections = []
+        images = {}
+        for kind in IMAGE_KINDS:
+            section = _expect(payload.get(kind) or {}, dict, f"'{kind}'")
+            for det in _expect(section.get("detections") or [], list, f"'{kind}.detections'"):
+                det = _expect(det, dict, f"Each '{kind}' detection")
+                bbox = det.get("bbox") or [None] * 4
+                if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+                    raise ValueError(f"Invalid bbox in '{kind}' detections.")
+                coords = [_optional_number(v, f"'{kind}' bbox coordinate") for v in bbox]
+                confidence = _optional_number(det.get("confidence"), f"'{kind}' confidence")
+                detections.append((kind, str(det.get("label", "")), confidence, *coords))
+            if section.get("image_base64"):
+                images[kind] = _prepare_image(
+                    _decode_base64(_expect(section["image_base64"], str, f"'{kind}.image_base64'"))
+                )
+
+        voltage = []
+        for row in _expect(payload.get("voltage") or [], list, "'voltage'"):
+            row = _expect(row, dict, "Each voltage row")
+            if row.get("point") is None:
+                continue
+            voltage.append((
+                str(row["point"]),
+                _optional_number(row.get("value"), "Voltage value"),
+                _optional_number(row.get("expected"), "Expected voltage"),
+                None if row.get("status") is None else str(row["status"]),
+            ))
+        voltage_failures = sum(1 for r in voltage if r[3] == "NOT OK")
+
+        # Everything is validated and decoded above; image files are written last, inside the
+        # transaction, so a failed insert leaves no files and a failed write leaves no rows.
+        hashes = {kind: image.hash for kind, image in images.items()}
+        with self._connect() as conn:
+            for image in images.values():
+                self._insert_image(conn, image)
+            cursor = conn.execute(
+                """INSERT INTO reports (board_serial, board_type, created_at, technician, notes, model_versions,
+                                        missing_count, burnt_count, voltage_failures, thumb_hash)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    serial,
+                    board_type,
+                    _utc_now(),
+                    technician,
+                    notes,
+                    json.dumps(model_versions or {}),
+                    sum(1 for d in detections if d[0] == "missing"),
+                    sum(1 for d in detections if d[0] == "burnt"),
+                    voltage_failures,
+                    next(iter(hashes.values()), None),
+                ),
+            )
+            report_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO detections (report_id, kind, label, confidence, x1, y1, x2, y2) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(report_id, *d) for d in detections],
+            )
+            conn.executemany(
+                "INSERT INTO voltage_results (report_id, point, value, expected, status) VALUES (?, ?, ?, ?, ?)",
+                [(report_id, *r) for r in voltage],
+            )
+            conn.executemany(
+                "INSERT INTO report_images (report_id, kind, image_hash) VALUES (?, ?, ?)",
+                [(report_id, kind, image_hash) for kind, image_hash in hashes.items()],
+            )
+            for image in images.values():
+                self._write_image_files(image)
+        return report_id
+
+    # -- reads -------------------------------------------------------------
+    def list_reports(
+        self,
+        board_serial: Optional[str] = None,
+        board_type: Optional[str] = None,
+        label: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[int] = None,
+        limit: int = 50,
+    ) -> Dict:
+        """Newest-first page of report summaries; pass next_cursor back for the next page."""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = [], []
+        if board_serial:
+            clauses.append("board_serial = ?")
+            params.append(board_serial)
+        if board_type:
+            clauses.append("board_type = ?")
+            params.append(board_type)
+        if label:
+            clauses.append("id IN (SELECT report_id FROM detections WHERE label = ?)")
+            params.append(label)
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("created_at < ?")
+            params.append(until)
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(int(cursor))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""SELECT id, board_serial, board_type, created_at, technician, missing_count, burnt_count,
+                           voltage_failures, thumb_hash
+                    FROM reports {where} ORDER BY id DESC LIMIT ?""",
+                (*params, limit + 1),
+            ).fetchall()
+
+        reports = [dict(row) for row in rows[:limit]]
+        return {
+            "reports": reports,
+            "next_cursor": reports[-1]["id"] if len(rows) > limit else None,
+        }
+
+    def get_report(self, report_id: int) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM reports WHERE id = ?", (report_id,)).fetchone()
+            if row is None:
+                return None
+            report = dict(row)
+            report["model_versions"] = json.loads(report["model_versions"] or "{}")
+            detections = conn.execute(
+                "SELECT kind, label, confidence, x1, y1, x2, y2 FROM detections WHERE report_id = ?", (report_id,)
+            ).fetchall()
+            report["detections"] = {kind: [] for kind in IMAGE_KINDS}
+            for det in detections:
+                report["detections"].setdefault(det["kind"], []).append({
+                    "label": det["label"],
+                    "confidence": det["confidence"],
+                    "bbox": [det["x1"], det["y1"], det["x2"], det["y2"]],
+                })
+            report["voltage"] = [
+                dict(r) for r in conn.execute(
+                    "SELECT point, value, expected, status FROM voltage_results WHERE report_id = ?", (report_id,)
+                ).fetchall()
+            ]
+            report["images"] = {
+                r["kind"]: dict(r) for r in conn.execute(
+                    """SELECT ri.kind, i.hash, i.width, i.height, i.size_bytes
+                       FROM report_images ri JOIN images i ON i.hash = ri.image_hash
+                       WHERE ri.report_id = ?""",
+                    (report_id,),
+                ).fetchall()
+            }
+        return report
+
+
+@dataclass
+class _PreparedImage:
+    hash: str
+    data: bytes
+    width: int
+    height: int
+    thumb: bytes
+
+
+def _prepare_image(image_bytes: bytes) -> _PreparedImage:
+    """Decode (validating) an uploaded image and encode its thumbnail, without touching disk."""
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Report image could not be decoded.")
+    height, width = image.shape[:2]
+    scale = THUMB_MAX_SIDE / max(height, width)
+    thumb = image if scale >= 1 else cv2.resize(
+        image, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA
+    )
+    ok, thumb_buffer = cv2.imencode(".jpg", thumb, [cv2.IMWRITE_JPEG_QUALITY, THUMB_JPEG_QUALITY])
+    if not ok:
+        raise RuntimeError("Failed to encode report thumbnail.")
+    return _PreparedImage(hashlib.sha256(image_bytes).hexdigest(), image_bytes, width, height, thumb_buffer.tobytes())
+
+
+def _optional_text(value, what: str) -> Optional[str]:
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{what} must be a string.")
+    return value
+
+
+def _expect(value, kind: type, what: str):
+    if not isinstance(value, kind):
+        raise ValueError(f"{what} must be {'an object' if kind is dict else 'a ' + kind.__name__}.")
+    return value
+
+
+def _optional_number(value, what: str) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"{what} must be a number.")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{what} must be a number.") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{what} must be finite.")
+    return number
+
+
+def _decode_base64(image_base64: str) -> bytes:
+    if "," in image_base64:
+        image_base64 = image_base64.split(",", 1)[1]
+    try:
+        return base64.b64decode(image_base64)
+    except (base64.binascii.Error, ValueError) as exc:  # type: ignore[attr-defined]
+        raise ValueError("Invalid base64 image data in report.") from exc
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
@@ -0,0 +1,192 @@
+"""
+Bounded per-worker caches for detection follow-ups.
+
+ResultCache: each detection request predicts once at RAW_FLOOR_CONFIDENCE;
+the raw boxes and the processed image are kept under a random result id so
+/detect/rethreshold can re-filter, re-run NMS and re-annotate for another
+threshold or class subset without touching the model.
+
+SessionImageCache: the decoded full-resolution upload, one per browser
+session, so /detect/roi can re-inspect a region at native resolution
+without the client re-uploading (and the server re-decoding) the image.
+
+Entries are evicted least-recently-used once a cache exceeds its byte
+budget, and expire after TTL seconds without a lookup (so a technician
+dragging the threshold slider keeps their result alive). With an RSS
+ceiling configured, the budgets are capped to a share of it (cache_budgets)
+and admission control sheds the caches before rejecting a request for
+memory. The caches are per worker process: with several gunicorn workers an
+entry is only visible to the worker that produced it (otherwise the
+endpoints answer 404 and the client re-runs detection).
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Generic, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from model.boxes import RawPrediction
+from utils import metrics
+
+
+CACHE_EVENTS = metrics.Counter(
+    "pcb_result_cache_events_total",
+    "Result/image cache lookups and evictions, by cache and event (hit, miss, evicted, expired, shed).",
+    ("cache", "event"),
+)
+CACHE_BYTES = metrics.Gauge(
+    "pcb_result_cache_bytes",
+    "Bytes held by the result/image caches.",
+    ("cache",),
+)
+metrics.REGISTRY.extend([CACHE_EVENTS, CACHE_BYTES])
+
+
+@dataclass
+class CachedResult:
+    model: str
+    raw: RawPrediction
+    image: np.ndarray
+    # Top-left of `image` in the full upload (non-zero for ROI results)
+    offset: Tuple[int, int] = (0, 0)
+    # Upload pixels per `image` pixel (> 1 when the board was downscaled for inference)
+    scale: float = 1.0
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def nbytes(self) -> int:
+        boxes = self.raw[0]
+        return int(self.image.nbytes + sum(array.nbytes for array in boxes))
+
+
+@dataclass
+class CachedImage:
+    model: str
+    image: np.ndarray
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.image.nbytes)
+
+
+Entry = TypeVar("Entry", CachedResult, CachedImage)
+
+
+class _BoundedCache(Generic[Entry]):
+    name = "cache"
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _store(self, key: str, entry: Entry) -> bool:
+        with self._lock:
+            # The key's previous entry goes even if the new one is rejected, so a
+            # too-large upload never leaves the session pointing at an older image.
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            if entry.nbytes > self.max_bytes:
+                CACHE_BYTES.set(self._bytes, self.name)
+                return False
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            self._evict_locked()
+        return True
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            self._evict_locked()
+            entry = self._entries.get(key)
+            if entry is None:
+                CACHE_EVENTS.inc(self.name, "miss")
+                return None
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(key)
+            CACHE_EVENTS.inc(self.name, "hit")
+            return entry
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+    def clear(self) -> int:
+        """Drop every entry (memory pressure); returns bytes freed."""
+        with self._lock:
+            freed = self._bytes
+            if self._entries:
+                CACHE_EVENTS.inc(self.name, "shed", amount=len(self._entries))
+            self._entries.clear()
+            self._bytes = 0
+            CACHE_BYTES.set(0, self.name)
+            return freed
+
+    def _evict_locked(self) -> None:
+        # Entries are ordered by last use, so expired ones are always at the front.
+        now = time.monotonic()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry.last_used > self.ttl_seconds:
+                event = "expired"
+            elif self._bytes > self.max_bytes:
+                event = "evicted"
+            else:
+                break
+            del self._entries[key]
+            self._bytes -= entry.nbytes
+            CACHE_EVENTS.inc(self.name, event)
+        CACHE_BYTES.set(self._bytes, self.name)
+
+
+class ResultCache(_BoundedCache[CachedResult]):
+    name = "results"
+
+    def put(
+        self,
+        model: str,
+        raw: RawPrediction,
+        image: np.ndarray,
+        offset: Tuple[int, int] = (0, 0),
+        scale: float = 1.0,
+    ) -> Optional[str]:
+        """Cache a result and return its id, or None when it alone exceeds the budget."""
+        result_id = secrets.token_urlsafe(12)
+        entry = CachedResult(model=model, raw=raw, image=image, offset=offset, scale=scale)
+        if not self._store(result_id, entry):
+            return None
+        return result_id
+
+
+def cache_budgets(config) -> Tuple[int, int]:
+    """
+    Byte budgets for (ResultCache, SessionImageCache). With ADMISSION_MAX_RSS_MB
+    set, both are scaled down together to fit CACHE_RSS_SHARE of the ceiling, so
+    a full cache can't hold the worker over it.
+    """
+    result_mb = float(config["RESULT_CACHE_MAX_MB"])
+    image_mb = float(config["SESSION_IMAGE_CACHE_MAX_MB"])
+    allowed_mb = float(config.get("ADMISSION_MAX_RSS_MB") or 0) * float(config.get("CACHE_RSS_SHARE", 0.25))
+    if allowed_mb > 0 and result_mb + image_mb > allowed_mb:
+        factor = allowed_mb / (result_mb + image_mb)
+        result_mb, image_mb = result_mb * factor, image_mb * factor
+    return int(result_mb * 1024 * 1024), int(image_mb * 1024 * 1024)
+
+
+class SessionImageCache(_BoundedCache[CachedImage]):
+    name = "session_images"
+
+    def put(self, session_key: str, model: str, image: np.ndarray) -> bool:
+        """Keep `image` as the session's current upload, replacing any previous one."""
+        return self._store(session_key, CachedImage(model=model, image=image))